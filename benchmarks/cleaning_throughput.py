@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Throughput (docs/s) de la etapa de limpieza (scripts/data_cleaning.py) según el número de procesos.
+Genera un export sintético con la forma de los JSONL de Confluence (marcas de Atlassian, colores,
+líneas repetidas y de solo símbolos, páginas largas que se fragmentan), lo limpia con 1, 2, 4, ...
+procesos y comprueba que la salida es idéntica byte a byte a la de 1 proceso.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import filecmp
+import tempfile
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from data_cleaning import CHUNK_LINES, clean_directory  # noqa: E402
+from corpus_vocabulary import SPACES, VOCABULARY  # noqa: E402
+
+MARKUP = (":info:", ":check_mark:", ":cross_mark:", "atlassian-panel", "atlassian-table_cell", "#1F2E3D", "#ffab00")
+
+
+def synthetic_page(rng, doc_num):
+    """Página de Confluence en bruto: párrafos con marcado, separadores y líneas duplicadas."""
+    lines = []
+    for _ in range(rng.randint(5, 60)):
+        kind = rng.random()
+        if kind < 0.1:
+            lines.append(rng.choice(("----", "****", "|  |  |", "", "   ")))
+        elif kind < 0.2 and lines:
+            lines.append(rng.choice(lines))
+        else:
+            words = [rng.choice(VOCABULARY) for _ in range(rng.randint(4, 40))]
+            for _ in range(rng.randint(0, 3)):
+                words.insert(rng.randrange(len(words) + 1), rng.choice(MARKUP))
+            lines.append("  ".join(words) if rng.random() < 0.2 else " ".join(words))
+    return {
+        "id": str(100000 + doc_num),
+        "title": f"Página {doc_num}",
+        "space_key": rng.choice(SPACES),
+        "url": f"https://confluence.example.com/pages/{100000 + doc_num}",
+        "content": "\n".join(lines)
+    }
+
+
+def write_export(directory, docs, files, seed):
+    rng = random.Random(seed)
+    handles = [open(os.path.join(directory, f"space_{i}.jsonl"), "w", encoding="utf-8") for i in range(files)]
+    try:
+        for doc_num in range(docs):
+            handles[doc_num % files].write(json.dumps(synthetic_page(rng, doc_num), ensure_ascii=False) + "\n")
+    finally:
+        for f in handles:
+            f.close()
+    return sorted(f for f in os.listdir(directory) if f.endswith(".jsonl"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de scripts/data_cleaning.py por número de procesos")
+    parser.add_argument("--docs", type=int, default=50000, help="Páginas sintéticas en total")
+    parser.add_argument("--files", type=int, default=4, help="Archivos .jsonl en los que se reparten")
+    parser.add_argument("--workers", type=str, default=None, help="Procesos a medir, separados por coma (default: 1,2,4,... hasta los núcleos)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_LINES, help="Líneas por tarea del pool")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="Guardar los resultados en este JSON")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if args.workers:
+        workers_list = [int(w) for w in args.workers.split(",")]
+    else:
+        workers_list = [1]
+        while workers_list[-1] * 2 <= cores:
+            workers_list.append(workers_list[-1] * 2)
+        if workers_list[-1] != cores:
+            workers_list.append(cores)
+
+    tmp = tempfile.mkdtemp(prefix="cleaning_bench_")
+    try:
+        raw_dir = os.path.join(tmp, "raw")
+        os.makedirs(raw_dir)
+        archivos = write_export(raw_dir, args.docs, args.files, args.seed)
+        size_mb = sum(os.path.getsize(os.path.join(raw_dir, f)) for f in archivos) / 1024 ** 2
+        print(f"{args.docs} páginas sintéticas en {len(archivos)} archivos ({size_mb:.1f} MB), {cores} núcleos disponibles.\n")
+
+        results = []
+        reference_dir = None
+        print(f"{'procesos':>8} {'segundos':>9} {'docs/s':>10} {'speedup':>8}  salida")
+        for workers in workers_list:
+            out_dir = os.path.join(tmp, f"clean_{workers}")
+            os.makedirs(out_dir)
+            start = time.perf_counter()
+            docs = clean_directory(raw_dir, out_dir, archivos, workers, args.chunk_size, progress=False)
+            elapsed = time.perf_counter() - start
+            if reference_dir is None:
+                reference_dir = out_dir
+                identical = True
+            else:
+                _, mismatch, errors = filecmp.cmpfiles(reference_dir, out_dir, archivos, shallow=False)
+                identical = not mismatch and not errors
+            result = {"workers": workers, "seconds": round(elapsed, 3), "docs_per_s": round(docs / elapsed, 1),
+                      "identical_output": identical}
+            result["speedup"] = round(result["docs_per_s"] / results[0]["docs_per_s"], 2) if results else 1.0
+            results.append(result)
+            print(f"{workers:>8} {elapsed:>9.2f} {result['docs_per_s']:>10.1f} {result['speedup']:>7.2f}x  "
+                  f"{'idéntica' if identical else 'DISTINTA'}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"docs": args.docs, "files": args.files, "chunk_size": args.chunk_size, "cores": cores,
+                       "results": results}, f, indent=2)
+        print(f"\nResultados guardados en '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
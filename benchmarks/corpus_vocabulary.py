@@ -0,0 +1,15 @@
+"""
+Vocabulario y valores de metadatos de los corpus sintéticos de los benchmarks. Sin dependencias:
+lo importan tanto synthetic_corpus.py (Chroma, NumPy) como cleaning_throughput.py (solo stdlib).
+"""
+
+SPACES = ("QA", "DEV", "PROD", "OPS", "DOCS")
+PROJECTS = ("PRODU", "BACK", "FRONT", "INFRA")
+STATUSES = ("Open", "In Progress", "Done", "Closed")
+LABELS = ("regression", "login", "performance", "release", "hotfix", "onboarding")
+VOCABULARY = (
+    "login error timeout token config deploy cache search admin user jira confluence release "
+    "pipeline test regression entorno despliegue producción usuario permiso base datos servicio "
+    "api endpoint respuesta latencia memoria cola índice consulta colección fragmento migración "
+    "rollback alerta monitor métrica build rama merge revisión incidencia bloqueo credencial"
+).split()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Compara la búsqueda exacta (exact_backend.ExactIndex) con el HNSW de Chroma sobre colecciones
+sintéticas de distintos tamaños y muestra dónde está el punto de cruce en esta máquina, para
+elegir EXACT_SEARCH_MAX_DOCS. Todo en memoria (EphemeralClient), sin red ni modelo de embeddings.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import chromadb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from exact_backend import ExactIndex  # noqa: E402
+
+
+def synthetic_embeddings(rng, n, dim, clusters=64):
+    """Vectores normalizados agrupados en clusters (más parecidos a embeddings reales que ruido uniforme)."""
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def build_collection(client, name, vectors, space, batch_size=5000):
+    collection = client.create_collection(name, metadata={"hnsw:space": space})
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        collection.add(ids=[f"doc{i}" for i in range(start, start + len(batch))], embeddings=batch.tolist())
+    return collection
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def run_size(client, rng, size, args):
+    vectors = synthetic_embeddings(rng, size, args.dim)
+    queries = synthetic_embeddings(rng, args.queries, args.dim)
+    start = time.perf_counter()
+    collection = build_collection(client, f"bench_{size}", vectors, args.space)
+    hnsw_build = time.perf_counter() - start
+
+    exact = ExactIndex(collection)
+    start = time.perf_counter()
+    len(exact)
+    exact_build = time.perf_counter() - start
+
+    # Una consulta por llamada, como /search
+    hnsw_times, exact_times, recall = [], [], []
+    for query in queries:
+        q = [query.tolist()]
+        start = time.perf_counter()
+        hnsw_ids = collection.query(query_embeddings=q, n_results=args.k, include=["distances"])["ids"][0]
+        hnsw_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        exact_ids = exact.search(q, args.k)["ids"][0]
+        exact_times.append(time.perf_counter() - start)
+        recall.append(len(set(hnsw_ids) & set(exact_ids)) / max(len(exact_ids), 1))
+
+    # Lote completo en un solo GEMM, como /search/batch
+    start = time.perf_counter()
+    exact.search(queries, args.k)
+    exact_batch = time.perf_counter() - start
+
+    client.delete_collection(collection.name)
+    return {
+        "size": size,
+        "hnsw_build_s": round(hnsw_build, 3),
+        "exact_build_s": round(exact_build, 3),
+        "hnsw_p50_ms": percentile_ms(hnsw_times, 50),
+        "hnsw_p95_ms": percentile_ms(hnsw_times, 95),
+        "exact_p50_ms": percentile_ms(exact_times, 50),
+        "exact_p95_ms": percentile_ms(exact_times, 95),
+        "exact_batch_qps": round(len(queries) / exact_batch, 1),
+        "hnsw_recall_at_k": round(float(np.mean(recall)), 4),
+        "exact_matrix_mb": round(size * args.dim * 4 / 1024 ** 2, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda exacta (NumPy/BLAS) frente a HNSW para elegir EXACT_SEARCH_MAX_DOCS.")
+    parser.add_argument('--sizes', type=str, default="1000,5000,10000,25000,50000,100000", help='Tamaños de colección separados por coma')
+    parser.add_argument('--dim', type=int, default=384, help='Dimensión de los embeddings (all-MiniLM-L6-v2: 384)')
+    parser.add_argument('--queries', type=int, default=200, help='Consultas por tamaño')
+    parser.add_argument('--k', type=int, default=5, help='n_results de cada consulta')
+    parser.add_argument('--space', type=str, default="l2", choices=["l2", "cosine", "ip"], help='Espacio de distancia hnsw:space')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de los datos sintéticos')
+    parser.add_argument('--output', type=str, default=None, help='Guardar los resultados en este fichero JSON')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    client = chromadb.EphemeralClient()
+    results = []
+    print(f"{'docs':>8} {'hnsw p50':>10} {'exact p50':>10} {'exact qps (lote)':>17} {'recall hnsw':>12} {'matriz MB':>10}")
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        row = run_size(client, rng, size, args)
+        results.append(row)
+        print(f"{row['size']:>8} {row['hnsw_p50_ms']:>8} ms {row['exact_p50_ms']:>8} ms {row['exact_batch_qps']:>17} "
+              f"{row['hnsw_recall_at_k']:>12} {row['exact_matrix_mb']:>10}")
+
+    faster = [r["size"] for r in results if r["exact_p50_ms"] <= r["hnsw_p50_ms"]]
+    crossover = max(faster) if faster else None
+    if crossover:
+        print(f"\nLa búsqueda exacta es igual o más rápida hasta {crossover} documentos: SEARCH_BACKEND=auto y EXACT_SEARCH_MAX_DOCS={crossover} (a costa de una copia de los vectores por worker)")
+    else:
+        print("\nHNSW es más rápido en todos los tamaños medidos: mantener SEARCH_BACKEND=hnsw (por defecto)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "crossover": crossover, "results": results}, f, indent=2)
+        print(f"Resultados guardados en '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Mide recall@k y latencia del HNSW de Chroma para una rejilla de parámetros (hnsw:M,
+hnsw:construction_ef y ef de consulta) frente a la búsqueda exacta, y escribe una tabla
+latencia/recall para elegir el punto de trabajo (flags --hnsw-* del loader, `ef` de /search).
+Usa los embeddings de una colección existente (--collection) o datos sintéticos.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import chromadb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from exact_backend import ExactIndex  # noqa: E402
+from exact_vs_hnsw import synthetic_embeddings  # noqa: E402
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def load_vectors(args, rng):
+    """Embeddings de la colección indicada (hasta --size) o sintéticos; devuelve (índice, consultas)."""
+    total = args.size + args.queries
+    if args.collection:
+        source = chromadb.PersistentClient(path=args.db_path).get_collection(args.collection)
+        vectors = []
+        offset = 0
+        while offset < min(total, source.count()):
+            page = source.get(include=["embeddings"], limit=min(5000, total - offset), offset=offset)
+            if not len(page["ids"]):
+                break
+            vectors.extend(page["embeddings"])
+            offset += len(page["ids"])
+        vectors = np.asarray(vectors, dtype=np.float32)
+        space = (source.metadata or {}).get("hnsw:space", "l2")
+    else:
+        vectors = synthetic_embeddings(rng, total, args.dim)
+        space = args.space
+    # Las consultas salen del mismo conjunto pero no se indexan
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[:args.queries]]
+    return vectors[order[args.queries:]], queries, space
+
+
+def build_collection(client, name, vectors, metadata, batch_size=5000):
+    collection = client.create_collection(name, metadata=metadata)
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        collection.add(ids=[f"doc{i}" for i in range(start, start + len(batch))], embeddings=batch.tolist())
+    return collection
+
+
+def measure(collection, queries, truth, k, ef):
+    """Misma técnica que main.ann_query: pedir max(k, ef) vecinos y recortar a k."""
+    times, recall = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        ids = collection.query(query_embeddings=[query.tolist()], n_results=max(k, ef), include=["distances"])["ids"][0][:k]
+        times.append(time.perf_counter() - start)
+        recall.append(len(set(ids) & set(expected)) / max(len(expected), 1))
+    return {
+        "recall_at_k": round(float(np.mean(recall)), 4),
+        "p50_ms": round(float(np.percentile(times, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(times, 95)) * 1000, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabla recall@k / latencia del HNSW para una rejilla de M, construction_ef y ef.")
+    parser.add_argument('--collection', type=str, default=None, help='Colección de la que tomar los embeddings (default: datos sintéticos)')
+    parser.add_argument('--db-path', type=str, default=os.getenv("CHROMADB_PATH", "./my_chroma_db"), help='Ruta de la base de ChromaDB')
+    parser.add_argument('--size', type=int, default=20000, help='Número de vectores a indexar')
+    parser.add_argument('--dim', type=int, default=384, help='Dimensión de los datos sintéticos')
+    parser.add_argument('--space', type=str, default="l2", choices=["l2", "cosine", "ip"], help='Espacio de los datos sintéticos')
+    parser.add_argument('--queries', type=int, default=200, help='Consultas de muestra (excluidas del índice)')
+    parser.add_argument('--k', type=int, default=5, help='k del recall@k')
+    parser.add_argument('--m', type=int_list, default="8,16,32", help='Valores de hnsw:M')
+    parser.add_argument('--construction-ef', type=int_list, default="100,200", help='Valores de hnsw:construction_ef')
+    parser.add_argument('--ef', type=int_list, default="10,20,50,100,200", help='Valores de ef de consulta')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla del muestreo')
+    parser.add_argument('--output', type=str, default=None, help='Guardar los resultados en este fichero JSON')
+    parser.add_argument('--markdown', type=str, default=None, help='Guardar la tabla en este fichero Markdown')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors, queries, space = load_vectors(args, rng)
+    print(f"{len(vectors)} vectores indexados, {len(queries)} consultas, espacio {space}, k={args.k}")
+    client = chromadb.EphemeralClient()
+
+    truth = None
+    rows = []
+    for m in args.m:
+        for construction_ef in args.construction_ef:
+            metadata = {"hnsw:space": space, "hnsw:M": m, "hnsw:construction_ef": construction_ef}
+            start = time.perf_counter()
+            collection = build_collection(client, f"tuning_m{m}_c{construction_ef}", vectors, metadata)
+            build_s = round(time.perf_counter() - start, 3)
+            if truth is None:
+                truth = ExactIndex(collection).search(queries, args.k)["ids"]
+            for ef in args.ef:
+                row = {"M": m, "construction_ef": construction_ef, "ef": ef, "build_s": build_s,
+                       **measure(collection, queries, truth, args.k, ef)}
+                rows.append(row)
+                print(f"  M={m} construction_ef={construction_ef} ef={ef}: recall@{args.k}={row['recall_at_k']} "
+                      f"p50={row['p50_ms']} ms p95={row['p95_ms']} ms")
+            client.delete_collection(collection.name)
+
+    rows.sort(key=lambda r: r["p50_ms"])
+    table = [f"| M | construction_ef | ef | recall@{args.k} | p50 (ms) | p95 (ms) | build (s) |",
+             "|---|---|---|---|---|---|---|"]
+    table += [f"| {r['M']} | {r['construction_ef']} | {r['ef']} | {r['recall_at_k']} | {r['p50_ms']} | {r['p95_ms']} | {r['build_s']} |"
+              for r in rows]
+    print("\n" + "\n".join(table))
+    # Frontera de Pareto: configuraciones que ninguna otra mejora a la vez en latencia y recall
+    best_recall = -1.0
+    pareto = []
+    for r in rows:
+        if r["recall_at_k"] > best_recall:
+            pareto.append(r)
+            best_recall = r["recall_at_k"]
+    print("\nFrontera latencia/recall: " + ", ".join(f"M={r['M']}/c={r['construction_ef']}/ef={r['ef']} ({r['recall_at_k']})" for r in pareto))
+
+    if args.markdown:
+        with open(args.markdown, "w", encoding="utf-8") as f:
+            f.write("\n".join(table) + "\n")
+        print(f"Tabla guardada en '{args.markdown}'.")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "space": space, "results": rows, "pareto": pareto}, f, indent=2)
+        print(f"Resultados guardados en '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de /search: genera (o reutiliza) colecciones sintéticas, arranca main.py con
+uvicorn contra cada una y reproduce mezclas de consultas a concurrencia fija. Mide throughput,
+latencia p50/p95/p99, CPU y RSS del servidor y guarda un JSON que se puede comparar con otra
+ejecución (--compare) para ver el efecto de una actualización de Chroma, torch o del modelo.
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import threading
+import subprocess
+import http.client
+from importlib import metadata as importlib_metadata
+
+import numpy as np
+
+from synthetic_corpus import (LABELS, SPACES, WORD_WEIGHTS, WORDS, build_collection, collection_name,
+                              parse_size, size_label)
+
+CUM_WEIGHTS = np.cumsum(WORD_WEIGHTS).tolist()
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+PACKAGES = ("chromadb", "numpy", "torch", "sentence-transformers", "onnxruntime", "fastapi", "uvicorn")
+
+# Mezclas de consultas: (peso, plantilla de la petición). La consulta se genera en cada petición.
+MIXES = {
+    "vector": [(1.0, {})],
+    "filtered": [(1.0, {"where": "space_key"})],
+    "hybrid": [(1.0, {"mode": "hybrid"})],
+    "mixed": [
+        (0.55, {}),
+        (0.2, {"where": "space_key"}),
+        (0.15, {"mode": "hybrid"}),
+        (0.05, {"group_by": "document"}),
+        (0.05, {"mode": "lexical"})
+    ]
+}
+
+
+def make_request(rng, template, n_results):
+    words = rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=rng.randint(2, 5))
+    if rng.random() < 0.2:
+        words.append(f"PRODU-{10000 + rng.randint(1, 5000)}")
+    body = {"query": " ".join(words), "n_results": n_results}
+    for key, value in template.items():
+        if key == "where":
+            body["where"] = {value: rng.choice(SPACES)} if value == "space_key" else {value: rng.choice(LABELS)}
+        else:
+            body[key] = value
+    return json.dumps(body)
+
+
+class ServerProcess:
+    """main.py bajo uvicorn en un subproceso, con muestreo de CPU y RSS (proceso + workers) vía /proc."""
+
+    def __init__(self, db_path, collection, port, workers, env_overrides, log_path):
+        env = dict(os.environ, CHROMADB_PATH=os.path.abspath(db_path), CHROMADB_COLLECTION=collection,
+                   **env_overrides)
+        self.port = port
+        self._log = open(log_path, "w", encoding="utf-8")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=REPO_ROOT, env=env, stdout=self._log, stderr=subprocess.STDOUT
+        )
+
+    def wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"El servidor terminó al arrancar (código {self.process.returncode}), ver {self._log.name}")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=2)
+                conn.request("GET", "/readyz")
+                response = conn.getresponse()
+                if response.status == 200:
+                    return
+                state = json.loads(response.read() or b"{}")
+                if state.get("status") == "error":
+                    raise RuntimeError(f"Falló el warm-up del servidor: {state.get('error')}")
+            except OSError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"El servidor no estuvo listo en {timeout} s, ver {self._log.name}")
+
+    def pids(self):
+        pids = [self.process.pid]
+        for pid in pids:
+            try:
+                for task in os.listdir(f"/proc/{pid}/task"):
+                    with open(f"/proc/{pid}/task/{task}/children") as f:
+                        pids.extend(int(p) for p in f.read().split())
+            except OSError:
+                continue
+        return pids
+
+    def usage(self):
+        """(segundos de CPU, RSS en bytes) sumados del proceso principal y sus hijos."""
+        cpu, rss = 0.0, 0
+        ticks = os.sysconf("SC_CLK_TCK")
+        for pid in self.pids():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                cpu += (int(fields[11]) + int(fields[12])) / ticks
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            rss += int(line.split()[1]) * 1024
+            except OSError:
+                continue
+        return cpu, rss
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+
+
+def run_level(server, mix, concurrency, duration, warmup, n_results, seed):
+    """Bucle cerrado: `concurrency` clientes lanzan peticiones sin pausa durante `duration` segundos."""
+    weights, templates = zip(*MIXES[mix])
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    start_at = time.monotonic() + warmup
+    stop_at = start_at + duration
+
+    def client(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=60)
+        local, failed = [], 0
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            body = make_request(rng, rng.choices(templates, weights)[0], n_results)
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", "/search", body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=60)
+            elapsed = time.perf_counter() - t0
+            # Las peticiones del calentamiento no cuentan
+            if now >= start_at:
+                if ok:
+                    local.append(elapsed)
+                else:
+                    failed += 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(max(0.0, start_at - time.monotonic()))
+    cpu_start, _ = server.usage()
+    rss_max = 0
+    while time.monotonic() < stop_at:
+        rss_max = max(rss_max, server.usage()[1])
+        time.sleep(0.25)
+    cpu_end, rss = server.usage()
+    for thread in threads:
+        thread.join()
+
+    samples = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "mix": mix,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "cpu_percent": round((cpu_end - cpu_start) / duration * 100, 1),
+        "rss_mb_max": round(max(rss_max, rss) / 1024 ** 2, 1)
+    }
+
+
+def environment_info():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = importlib_metadata.version(package)
+        except importlib_metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions
+    }
+
+
+def run_key(run):
+    return run["size"], run["mix"], run["concurrency"]
+
+
+def compare(old_path, new_path):
+    """Tabla de diferencias entre dos ejecuciones (mismo tamaño, mezcla y concurrencia)."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    changed = {k: (old["environment"]["packages"].get(k), v) for k, v in new["environment"]["packages"].items()
+               if old["environment"]["packages"].get(k) != v}
+    if changed:
+        print("Versiones distintas: " + ", ".join(f"{k} {a} -> {b}" for k, (a, b) in changed.items()))
+    old_runs = {run_key(r): r for r in old["runs"]}
+
+    def delta(a, b):
+        return f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+
+    print(f"{'tamaño':>7} {'mezcla':>9} {'conc':>5} {'rps':>16} {'p50':>16} {'p95':>16} {'p99':>16} {'rss MB':>14}")
+    for run in new["runs"]:
+        before = old_runs.get(run_key(run))
+        if before is None:
+            continue
+        cells = [f"{run[m]} ({delta(before[m], run[m])})" for m in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "rss_mb_max")]
+        print(f"{run['size']:>7} {run['mix']:>9} {run['concurrency']:>5} " + " ".join(f"{c:>16}" for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de /search sobre colecciones sintéticas (offline).")
+    parser.add_argument('--sizes', type=str, default="10k,100k", help='Tamaños de colección en fragmentos (ej: 10k,100k,1m; 1m solo en máquinas con RAM para su HNSW)')
+    parser.add_argument('--mixes', type=str, default="vector,mixed", help=f"Mezclas de consultas ({', '.join(MIXES)})")
+    parser.add_argument('--concurrency', type=str, default="1,4,16,64", help='Niveles de concurrencia separados por coma')
+    parser.add_argument('--duration', type=float, default=30, help='Segundos medidos por nivel')
+    parser.add_argument('--warmup', type=float, default=5, help='Segundos de calentamiento por nivel (no se miden)')
+    parser.add_argument('--n-results', type=int, default=5, help='n_results de cada consulta')
+    parser.add_argument('--workers', type=int, default=1, help='Workers de uvicorn')
+    parser.add_argument('--port', type=int, default=8765, help='Puerto del servidor')
+    parser.add_argument('--db-path', type=str, default="./bench_chroma_db", help='Base de ChromaDB de las colecciones sintéticas')
+    parser.add_argument('--embeddings', type=str, default="random", choices=["random", "model"], help='Cómo generar los vectores de la colección (ver synthetic_corpus.py)')
+    parser.add_argument('--dim', type=int, default=384, help='Dimensión de los vectores sintéticos (la del modelo del servidor)')
+    parser.add_argument('--with-cache', action='store_true', help='Mantener la cache de resultados (por defecto se desactiva para medir el trabajo real)')
+    parser.add_argument('--server-env', action='append', default=[], help='Variable extra para el servidor, VAR=valor (repetible)')
+    parser.add_argument('--ready-timeout', type=float, default=600, help='Segundos máximos de arranque del servidor')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla')
+    parser.add_argument('--output', type=str, default=None, help='Fichero JSON de resultados (default: benchmarks/results/load_<fecha>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DESPUES'), help='Comparar dos ficheros de resultados y salir')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    mixes = [m.strip() for m in args.mixes.split(",") if m.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    unknown = [m for m in mixes if m not in MIXES]
+    if unknown:
+        parser.error(f"Mezclas desconocidas: {', '.join(unknown)}")
+    env_overrides = {} if args.with_cache else {"RESULT_CACHE_SIZE": "0"}
+    # Un warm-up fallido debe cortar la prueba en seguida, no tras varios reintentos
+    env_overrides["WARMUP_MAX_ATTEMPTS"] = "1"
+    env_overrides.update(dict(item.split("=", 1) for item in args.server_env))
+
+    output = args.output or os.path.join(REPO_ROOT, "benchmarks", "results", f"load_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    results = {"environment": environment_info(), "config": vars(args), "server_env": env_overrides, "runs": []}
+
+    for size in sizes:
+        name = build_collection(args.db_path, size, args.embeddings, args.dim, args.seed)
+        log_path = os.path.splitext(output)[0] + f"_{size_label(size)}.log"
+        print(f"\n[{name}] Arrancando main.py ({args.workers} worker(s))...")
+        start = time.perf_counter()
+        server = ServerProcess(args.db_path, name, args.port, args.workers, env_overrides, log_path)
+        try:
+            server.wait_ready(args.ready_timeout)
+            startup_s = round(time.perf_counter() - start, 2)
+            print(f"[{name}] Listo en {startup_s} s")
+            for mix in mixes:
+                for concurrency in levels:
+                    run = run_level(server, mix, concurrency, args.duration, args.warmup, args.n_results, args.seed)
+                    run.update({"size": size_label(size), "collection": collection_name(size), "startup_s": startup_s})
+                    results["runs"].append(run)
+                    print(f"  {mix:>9} c={concurrency:<3} {run['throughput_rps']:>8} rps  p50 {run['p50_ms']} ms  "
+                          f"p95 {run['p95_ms']} ms  p99 {run['p99_ms']} ms  cpu {run['cpu_percent']}%  "
+                          f"rss {run['rss_mb_max']} MB  errores {run['errors']}")
+                    # Se guarda tras cada nivel: una ejecución larga interrumpida no pierde lo medido
+                    with open(output, "w", encoding="utf-8") as f:
+                        json.dump(results, f, indent=2)
+        finally:
+            server.stop()
+    print(f"\nResultados guardados en '{output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Genera colecciones sintéticas con la misma forma que las que crea el pipeline (páginas de
+Confluence y tickets de Jira fragmentados, IDs "{id}::fragment{n}", metadatos space_key/type/
+status/project/labels) para los benchmarks. Todo es determinista a partir de la semilla y
+funciona sin red.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import chromadb
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "chroma_db_scripts"))
+from bm25_index import BM25Index, index_path, remove_index_files  # noqa: E402
+from corpus_vocabulary import LABELS, PROJECTS, SPACES, STATUSES, VOCABULARY  # noqa: E402
+
+# Vocabulario completo con frecuencias tipo Zipf: las palabras reales son las más frecuentes y una
+# cola larga de términos sintéticos hace que las listas de postings de BM25 tengan tamaños realistas
+WORDS = VOCABULARY + [f"term{i}" for i in range(20000)]
+WORD_WEIGHTS = 1.0 / np.arange(1, len(WORDS) + 1) ** 1.05
+WORD_WEIGHTS /= WORD_WEIGHTS.sum()
+_WORD_ARRAY = np.array(WORDS, dtype=object)
+_WORD_CDF = np.cumsum(WORD_WEIGHTS)
+
+
+def parse_size(value):
+    """'10k' -> 10000, '1m' -> 1000000."""
+    value = value.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+
+def size_label(size):
+    return f"{size // 1000000}m" if size % 1000000 == 0 else f"{size // 1000}k" if size % 1000 == 0 else str(size)
+
+
+def collection_name(size):
+    return f"bench_{size_label(size)}"
+
+
+def generate_fragments(size, seed=42, words_per_fragment=120):
+    """Genera `size` fragmentos como (id, texto, metadatos), igual que los guarda add_data_to_chromadb.py."""
+    rng = np.random.default_rng(seed)
+    produced = 0
+    doc_num = 0
+    while produced < size:
+        doc_num += 1
+        is_ticket = rng.random() < 0.4
+        project = PROJECTS[rng.integers(len(PROJECTS))]
+        doc_id = f"{project}-{10000 + doc_num}" if is_ticket else f"conf-{doc_num}"
+        total_fragments = int(min(rng.geometric(0.35), size - produced))
+        title = f"{'Ticket' if is_ticket else 'Página'} {doc_num}: " + " ".join(rng.choice(VOCABULARY, 4))
+        labels = sorted(set(rng.choice(LABELS, rng.integers(0, 3)).tolist()))
+        base_meta = {
+            "title": title,
+            "type": "ticket" if is_ticket else "page",
+            "space_key": SPACES[rng.integers(len(SPACES))],
+            "status": STATUSES[rng.integers(len(STATUSES))],
+            "project": project,
+            "labels": json.dumps(labels, ensure_ascii=False),
+            "source_file": f"synthetic_{'jira' if is_ticket else 'confluence'}.jsonl",
+            "file_type": "jsonl"
+        }
+        for fragment in range(1, total_fragments + 1):
+            words = _WORD_ARRAY[np.minimum(np.searchsorted(_WORD_CDF, rng.random(words_per_fragment)), len(WORDS) - 1)]
+            if is_ticket:
+                words[rng.integers(words_per_fragment)] = doc_id
+            meta = dict(base_meta)
+            if total_fragments > 1:
+                meta["fragment"] = fragment
+                meta["total_fragments"] = total_fragments
+            full_id = doc_id if total_fragments == 1 else f"{doc_id}::fragment{fragment}"
+            yield full_id, f"{title}\n\n{' '.join(words)}", meta
+            produced += 1
+
+
+def random_embeddings(rng, n, dim, clusters=256):
+    """Embeddings normalizados agrupados en clusters, para no tener que ejecutar el modelo."""
+    centroids = np.random.default_rng(0).standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def build_collection(db_path, size, embeddings="random", dim=384, seed=42, batch_size=5000, rebuild=False):
+    """
+    Crea (o reutiliza si ya está completa) la colección bench_<tamaño> en db_path, con su índice BM25.
+    embeddings="random" usa vectores sintéticos; "model" usa la función de embedding configurada.
+    """
+    client = chromadb.PersistentClient(path=db_path)
+    name = collection_name(size)
+    if rebuild:
+        try:
+            client.delete_collection(name)
+        except Exception:
+            pass
+    collection = client.get_or_create_collection(name)
+    bm25_path = index_path(db_path, name)
+    if (collection.count() == size and os.path.exists(bm25_path)
+            and len(BM25Index(bm25_path)) == size and not BM25Index(bm25_path).outdated):
+        print(f"Colección '{name}' ya generada ({size} fragmentos), se reutiliza.")
+        return name
+    if collection.count():
+        client.delete_collection(name)
+        collection = client.get_or_create_collection(name)
+
+    embedding_fn = None
+    if embeddings == "model":
+        from embedding_backends import get_embedding_function
+        embedding_fn = get_embedding_function()
+    rng = np.random.default_rng(seed + 1)
+    remove_index_files(bm25_path)
+    bm25 = BM25Index(bm25_path)
+    start = time.perf_counter()
+    batch = []
+
+    def flush():
+        ids, documents, metadatas = zip(*batch)
+        vectors = embedding_fn(list(documents)) if embedding_fn else random_embeddings(rng, len(ids), dim).tolist()
+        collection.add(ids=list(ids), documents=list(documents), metadatas=list(metadatas), embeddings=vectors)
+        bm25.add(ids, documents)
+        batch.clear()
+
+    for item in generate_fragments(size, seed):
+        batch.append(item)
+        if len(batch) == batch_size:
+            flush()
+            print(f"  - {collection.count()} de {size} fragmentos ({time.perf_counter() - start:.0f} s)")
+    if batch:
+        flush()
+    print(f"Colección '{name}' generada: {collection.count()} fragmentos en {time.perf_counter() - start:.1f} s.")
+    return name
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera colecciones sintéticas (Confluence/Jira fragmentados) para los benchmarks.")
+    parser.add_argument('--sizes', type=str, default="10k,100k,1m", help='Tamaños en fragmentos separados por coma (ej: 10k,100k,1m)')
+    parser.add_argument('--db-path', type=str, default="./bench_chroma_db", help='Base de ChromaDB donde crear las colecciones')
+    parser.add_argument('--embeddings', type=str, default="random", choices=["random", "model"], help='Vectores sintéticos o calculados con el modelo configurado')
+    parser.add_argument('--dim', type=int, default=384, help='Dimensión de los vectores sintéticos (debe coincidir con el modelo del servidor)')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla')
+    parser.add_argument('--rebuild', action='store_true', help='Regenerar aunque la colección ya exista')
+    args = parser.parse_args()
+    for size in [parse_size(s) for s in args.sizes.split(",") if s.strip()]:
+        build_collection(args.db_path, size, args.embeddings, args.dim, args.seed, rebuild=args.rebuild)
@@ -1,173 +1,489 @@
 import chromadb
-from chromadb.utils import embedding_functions
 import os
 import json
+import time
+import queue
+import hashlib
 import argparse
+import threading
+import numpy as np
+from collections import deque
+from bm25_index import BM25Index, index_path, remove_index_files
+from embedding_backends import EMBEDDING_BACKENDS, get_embedding_function
+from embedding_cache import CachedEmbedder, EmbeddingCache, default_cache_path
+from id_dedup import ExistingIds, SeenIds, id_hashes, iter_collection_ids
+from ingest_checkpoint import Checkpoint, default_checkpoint_path
+from parallel_embedding import ParallelEmbedder
 
-parser = argparse.ArgumentParser(description="Carga documentos .jsonl a ChromaDB desde una carpeta específica")
-parser.add_argument('--documents-dir', type=str, default=None, help='Carpeta de documentos .jsonl a cargar (ej: data/cleaned_data/20240613_xxxx o data/fragmented_data/20240613_xxxx)')
-parser.add_argument('--collection', type=str, default=None, help='Nombre de la colección en ChromaDB')
-args, unknown = parser.parse_known_args()
+CHROMA_DB_PATH = "./my_chroma_db"
+BATCH_SIZE = 500
+# Lotes en vuelo entre cada etapa (lectura -> embeddings -> escritura): acota la memoria
+QUEUE_SIZE = 4
 
-documents_folder = args.documents_dir
-if not documents_folder:
-    documents_folder = input("Nombre de la carpeta de documentos (.jsonl) (deja vacío para 'data/cleaned_data'): ").strip()
-    if not documents_folder:
-        documents_folder = "data/cleaned_data"
-os.makedirs(documents_folder, exist_ok=True)
 
-collection_name = args.collection
-if not collection_name:
-    while True:
-        collection_name = input("Nombre de la colección en ChromaDB (obligatorio): ").strip()
-        if collection_name:
-            break
-        print("[ERROR] Debes ingresar un nombre para la colección. Intenta de nuevo.")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Carga documentos .jsonl a ChromaDB desde una carpeta específica")
+    parser.add_argument('--documents-dir', type=str, default=None, help='Carpeta de documentos .jsonl a cargar (ej: data/cleaned_data/20240613_xxxx o data/fragmented_data/20240613_xxxx)')
+    parser.add_argument('--collection', type=str, default=None, help='Nombre de la colección en ChromaDB')
+    parser.add_argument('--embedding-backend', type=str, default=os.getenv("EMBEDDING_BACKEND", "sentence-transformers"), choices=EMBEDDING_BACKENDS, help='Backend de embeddings (sentence-transformers, onnx u onnx-int8)')
+    parser.add_argument('--embedding-model', type=str, default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"), help='Modelo de embeddings')
+    parser.add_argument('--hnsw-space', type=str, default=None, choices=['l2', 'cosine', 'ip'], help='Espacio de distancia del índice HNSW (solo al crear la colección; default de Chroma: l2)')
+    parser.add_argument('--hnsw-m', type=int, default=None, help='hnsw:M, vecinos por nodo del grafo (solo al crear la colección; default de Chroma: 16)')
+    parser.add_argument('--hnsw-construction-ef', type=int, default=None, help='hnsw:construction_ef (solo al crear la colección; default de Chroma: 100)')
+    parser.add_argument('--hnsw-search-ef', type=int, default=None, help='hnsw:search_ef por defecto de las consultas (solo al crear la colección; default de Chroma: 10)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Documentos por lote añadido a la colección (default: {BATCH_SIZE})')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help=f'Lotes en espera entre lectura, embeddings y escritura (default: {QUEUE_SIZE})')
+    parser.add_argument('--embedding-workers', type=int, default=int(os.getenv("EMBEDDING_WORKERS", "1")), help='Procesos que calculan embeddings, cada uno con su parte de los núcleos (1 = en el propio proceso)')
+    parser.add_argument('--embedding-chunk-size', type=int, default=64, help='Textos de longitud parecida por llamada al modelo en cada proceso')
+    parser.add_argument('--embedding-cache', type=str, default=os.getenv("INGEST_EMBEDDING_CACHE"), help='SQLite de la cache persistente de embeddings (default: <base de ChromaDB>/embedding_cache.sqlite3)')
+    parser.add_argument('--embedding-cache-max-mb', type=int, default=int(os.getenv("INGEST_EMBEDDING_CACHE_MAX_MB", "2048")), help='Tamaño máximo de la cache de embeddings en MB')
+    parser.add_argument('--no-embedding-cache', action='store_true', help='Calcular todos los embeddings sin usar la cache persistente')
+    parser.add_argument('--sync', action='store_true', help='Sincronizar la colección con la carpeta: actualizar los documentos cuyo contenido cambió y borrar los que ya no están')
+    parser.add_argument('--dedup-max-mb', type=int, default=int(os.getenv("INGEST_DEDUP_MAX_MB", "256")), help='Memoria máxima en MB del filtro de IDs existentes de la colección')
+    parser.add_argument('--resume', action='store_true', help='Reanudar una carga interrumpida desde su último checkpoint')
+    args, unknown = parser.parse_known_args()
+    return args
 
-CHROMA_DB_PATH = "./my_chroma_db"
 
-# --- Inicializa el cliente de ChromaDB ---
-try:
-    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    print("Cliente de ChromaDB (persistente) inicializado.")
-except Exception as e:
-    print(f"Error al inicializar el cliente persistente: {e}")
-    print("Intentando con un cliente efímero (en memoria)...")
-    client = chromadb.EphemeralClient()
-    print("Cliente de ChromaDB (efímero) inicializado.")
-
-# --- Embedding function ---
-try:
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-    print(f"Función de embedding cargada correctamente.")
-except Exception as e:
-    print(f"Error al cargar la función de embedding: {e}")
-    print("Asegúrate de tener 'sentence-transformers' instalado y conexión a internet la primera vez.")
-    exit()
-
-# --- Crear o cargar la colección ---
-try:
-    collection = client.get_or_create_collection(
-        name=collection_name,
-        embedding_function=sentence_transformer_ef
-    )
-    print(f"Colección '{collection_name}' obtenida/creada.")
-except Exception as e:
-    print(f"Error al obtener o crear la colección '{collection_name}': {e}")
-    exit()
-
-# --- Obtener IDs existentes en la colección ---
-ids_existentes = set()
-try:
-    if collection.count() > 0:
-        existing_items_ids = collection.get(include=["ids"])['ids']
-        if existing_items_ids:
-            ids_existentes = set(existing_items_ids)
-except Exception as e:
-    print(f"Advertencia: No se pudieron obtener los IDs existentes de la colección: {e}")
-
-if not os.path.exists(documents_folder):
-    os.makedirs(documents_folder)
-    print(f"Carpeta '{documents_folder}' creada. Por favor, añade tus archivos .jsonl allí.")
-
-documentos_para_anadir = []
-ids_para_anadir = []
-metadatos_para_anadir = []
-docs_omitidos = 0
-ids_lote = set()
-archivos_encontrados = 0
-archivos_nuevos_anadidos = 0
-
-print(f"\nBuscando archivos .jsonl en la carpeta '{documents_folder}'...")
-
-for nombre_archivo in os.listdir(documents_folder):
-    if not nombre_archivo.lower().endswith(".jsonl"):
-        continue
-    archivos_encontrados += 1
-    ruta_archivo = os.path.join(documents_folder, nombre_archivo)
-    try:
-        with open(ruta_archivo, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                try:
-                    doc = json.loads(line)
-                except Exception as e:
-                    print(f"  - [WARNING] Línea {line_num} en '{nombre_archivo}' no es JSON válido. Omitiendo.")
-                    docs_omitidos += 1
-                    continue
-                doc_id = doc.get("id", None)
-                title = doc.get("title", None)
-                content = doc.get("content", None)
-                fragment = doc.get("fragment", None)
-                total_fragments = doc.get("total_fragments", None)
-                full_id = doc_id if not fragment else f"{doc_id}::fragment{fragment}"
-                if full_id in ids_existentes:
+# Valores de Chroma para los parámetros HNSW que no figuran en los metadatos de la colección
+HNSW_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+
+HASH_EXCLUDED_FIELDS = {"source_file", "file_type", "content_hash"}
+
+
+def build_record(doc, nombre_archivo):
+    """Convierte una línea JSONL en (id, texto, metadatos) tal y como se guarda en la colección."""
+    doc_id = doc.get("id", None)
+    title = doc.get("title", None)
+    content = doc.get("content", None)
+    fragment = doc.get("fragment", None)
+    total_fragments = doc.get("total_fragments", None)
+    full_id = doc_id if not fragment else f"{doc_id}::fragment{fragment}"
+    meta = {"title": title, "source_file": nombre_archivo, "file_type": "jsonl"}
+    if fragment:
+        meta["fragment"] = fragment
+    if total_fragments:
+        meta["total_fragments"] = total_fragments
+    # Agregar todos los campos extra presentes en el registro (excepto id, title, content)
+    for k, v in doc.items():
+        if k not in {"id", "title", "content", "fragment", "total_fragments"}:
+            # Convertir listas o dicts a string para compatibilidad con ChromaDB
+            if v is None:
+                meta[k] = ""
+            elif isinstance(v, (list, dict)):
+                meta[k] = json.dumps(v, ensure_ascii=False)
+            else:
+                meta[k] = v
+    texto = f"{title}\n\n{content}"
+    meta["content_hash"] = content_hash(texto, meta)
+    return full_id, texto, meta
+
+
+def content_hash(texto, meta):
+    """
+    Hash del texto y los metadatos de un registro: si no cambia, --sync no lo vuelve a escribir.
+    No incluye los campos que dependen de dónde se leyó (el nombre del archivo cambia cuando el
+    fragmentador reparte las páginas de otra forma), solo los del propio documento.
+    """
+    estables = {k: v for k, v in meta.items() if k not in HASH_EXCLUDED_FIELDS}
+    material = texto + "\0" + json.dumps(estables, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class Pipeline:
+    """
+    Carga en streaming: un hilo lee los .jsonl y arma lotes, otro calcula sus embeddings y el hilo
+    principal los escribe en Chroma. Las colas acotadas hacen que las tres etapas se solapen y que
+    los lotes en memoria no dependan del tamaño del corpus. Lo único que crece con la carga son los
+    IDs leídos (SeenIds, 8 bytes por ID); el filtro de IDs existentes está acotado por --dedup-max-mb
+    y el índice BM25 está en disco.
+    """
+
+    def __init__(self, queue_size, sync=False, checkpoint=None):
+        self.parsed = queue.Queue(maxsize=queue_size)
+        self.embedded = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.errors = []
+        self.sync = sync
+        self.checkpoint = checkpoint
+        self.ids_leidos = SeenIds()
+        self.stats = {"archivos_encontrados": 0, "archivos_con_error": 0, "docs_omitidos": 0,
+                      "lineas_invalidas": 0, "nuevos": 0, "modificados": 0, "sin_cambios": 0}
+
+    def put(self, q, item):
+        """Encola esperando hueco; devuelve False si otra etapa ha fallado."""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, q):
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+
+    def fail(self, stage, error):
+        self.errors.append((stage, error))
+        self.stop.set()
+
+    def dedup(self, registros, existentes):
+        """
+        Filtra un lote de registros leídos: primero los IDs repetidos en esta carga y después los que ya
+        están en la colección. Sin --sync estos se omiten; con --sync solo se omiten si su content_hash
+        no ha cambiado. Devuelve (ids, textos, metadatos) de los registros a escribir.
+        """
+        hashes = id_hashes([r[2] for r in registros])
+        repetidos = self.ids_leidos.contains(hashes)
+        en_lote = set()
+        nuevos = []
+        for registro, h, repetido in zip(registros, hashes.tolist(), repetidos):
+            line_num, nombre_archivo, full_id = registro[:3]
+            if repetido or h in en_lote:
+                print(f"  - [WARNING] Línea {line_num} en '{nombre_archivo}' tiene un ID duplicado en el lote ('{full_id}'). Omitiendo.")
+                self.stats["docs_omitidos"] += 1
+                continue
+            en_lote.add(h)
+            nuevos.append(registro)
+        self.ids_leidos.add(np.fromiter(en_lote, dtype=np.uint64, count=len(en_lote)))
+
+        existentes = existentes.lookup([r[2] for r in nuevos], include_metadata=self.sync)
+        batch = ([], [], [])
+        for line_num, nombre_archivo, full_id, texto, meta in nuevos:
+            if full_id in existentes:
+                if not self.sync:
                     print(f"  - [WARNING] Línea {line_num} en '{nombre_archivo}' tiene un ID ya existente en la colección ('{full_id}'). Omitiendo.")
-                    docs_omitidos += 1
+                    self.stats["docs_omitidos"] += 1
                     continue
-                if full_id in ids_lote:
-                    print(f"  - [WARNING] Línea {line_num} en '{nombre_archivo}' tiene un ID duplicado en el lote ('{full_id}'). Omitiendo.")
-                    docs_omitidos += 1
+                if (existentes[full_id] or {}).get("content_hash") == meta["content_hash"]:
+                    self.stats["sin_cambios"] += 1
                     continue
-                ids_lote.add(full_id)
-                documentos_para_anadir.append(f"{title}\n\n{content}")
-                ids_para_anadir.append(full_id)
-                meta = {"title": title, "source_file": nombre_archivo, "file_type": "jsonl"}
-                if fragment:
-                    meta["fragment"] = fragment
-                if total_fragments:
-                    meta["total_fragments"] = total_fragments
-                # Agregar todos los campos extra presentes en el registro (excepto id, title, content)
-                for k, v in doc.items():
-                    if k not in {"id", "title", "content", "fragment", "total_fragments"}:
-                        # Convertir listas o dicts a string para compatibilidad con ChromaDB
-                        if v is None:
-                            meta[k] = ""
-                        elif isinstance(v, (list, dict)):
-                            meta[k] = json.dumps(v, ensure_ascii=False)
-                        else:
-                            meta[k] = v
-                metadatos_para_anadir.append(meta)
-        print(f"  - Archivo JSONL '{nombre_archivo}' procesado.")
+                self.stats["modificados"] += 1
+            elif self.sync:
+                self.stats["nuevos"] += 1
+            batch[0].append(full_id)
+            batch[1].append(texto)
+            batch[2].append(meta)
+        return batch
+
+    def read(self, documents_folder, existentes, batch_size):
+        """
+        Lee los .jsonl y encola lotes de hasta `batch_size` registros, ya sin duplicados (ver dedup).
+        Cada lote lleva la posición (archivo, byte, línea) tras su último registro para el checkpoint.
+        """
+        registros = []
+        cursor = None
+
+        def flush(cursor):
+            batch = self.dedup(registros, existentes)
+            registros.clear()
+            return not batch[0] or self.put(self.parsed, batch + (cursor,))
+
+        try:
+            for nombre_archivo in sorted(os.listdir(documents_folder)):
+                if not nombre_archivo.lower().endswith(".jsonl"):
+                    continue
+                self.stats["archivos_encontrados"] += 1
+                ruta_archivo = os.path.join(documents_folder, nombre_archivo)
+                inicio = self.checkpoint.start_position(nombre_archivo, ruta_archivo) if self.checkpoint else (0, 0)
+                if inicio is None:
+                    print(f"  - Archivo JSONL '{nombre_archivo}' ya cargado según el checkpoint. Saltando.")
+                    continue
+                offset, line_num = inicio
+                try:
+                    # En binario para conocer el byte exacto de cada línea (el checkpoint guarda offsets)
+                    with open(ruta_archivo, 'rb') as f:
+                        if offset:
+                            f.seek(offset)
+                            print(f"  - Reanudando '{nombre_archivo}' desde la línea {line_num + 1} (byte {offset}).")
+                        for line in f:
+                            offset += len(line)
+                            line_num += 1
+                            try:
+                                doc = json.loads(line)
+                            except Exception:
+                                print(f"  - [WARNING] Línea {line_num} en '{nombre_archivo}' no es JSON válido. Omitiendo.")
+                                self.stats["docs_omitidos"] += 1
+                                self.stats["lineas_invalidas"] += 1
+                                continue
+                            registros.append((line_num, nombre_archivo) + build_record(doc, nombre_archivo))
+                            if len(registros) == batch_size and not flush((nombre_archivo, offset, line_num)):
+                                return
+                    print(f"  - Archivo JSONL '{nombre_archivo}' procesado.")
+                except Exception as e:
+                    print(f"  - Error al leer el archivo JSONL '{nombre_archivo}': {e}")
+                    self.stats["archivos_con_error"] += 1
+                # Cierra el último lote parcial con la posición tras el último archivo leído
+                cursor = (nombre_archivo, offset, line_num)
+            if registros and not flush(cursor):
+                return
+            self.put(self.parsed, None)
+        except Exception as e:
+            self.fail("lectura", e)
+
+    def embed(self, embedder, in_flight):
+        """Mantiene hasta `in_flight` lotes calculándose a la vez y los entrega en orden."""
+        pending = deque()
+        try:
+            while True:
+                batch = self.get(self.parsed)
+                if batch is not None:
+                    pending.append((batch, embedder.submit(batch[1])))
+                while pending and (batch is None or len(pending) > in_flight or pending[0][1].done()):
+                    (ids, documentos, metadatos, cursor), embeddings = pending.popleft()
+                    if not self.put(self.embedded, (ids, documentos, metadatos, embeddings.result(), cursor)):
+                        return
+                if batch is None:
+                    self.put(self.embedded, None)
+                    return
+        except Exception as e:
+            self.fail("embeddings", e)
+
+    def run(self, documents_folder, existentes, batch_size, embedder, write_batch):
+        """Arranca lectura y embeddings en hilos y llama a write_batch por cada lote listo. Devuelve los documentos escritos."""
+        # Con varios procesos hay que tener lotes suficientes en vuelo para darles trabajo a todos
+        in_flight = max(self.embedded.maxsize, -(-2 * embedder.workers * embedder.chunk_size // batch_size))
+        threads = [
+            threading.Thread(target=self.read, args=(documents_folder, existentes, batch_size), name="lectura", daemon=True),
+            threading.Thread(target=self.embed, args=(embedder, in_flight), name="embeddings", daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+        escritos = 0
+        try:
+            while True:
+                batch = self.get(self.embedded)
+                if batch is None:
+                    break
+                ids, documentos, metadatos, embeddings, cursor = batch
+                write_batch(ids, documentos, metadatos, embeddings)
+                if self.checkpoint is not None:
+                    self.checkpoint.commit(cursor, len(ids))
+                escritos += len(ids)
+        except Exception as e:
+            self.fail("escritura", e)
+        self.stop.set()
+        for thread in threads:
+            thread.join()
+        return escritos
+
+
+def main():
+    args = parse_args()
+
+    documents_folder = args.documents_dir
+    if not documents_folder:
+        documents_folder = input("Nombre de la carpeta de documentos (.jsonl) (deja vacío para 'data/cleaned_data'): ").strip()
+        if not documents_folder:
+            documents_folder = "data/cleaned_data"
+    os.makedirs(documents_folder, exist_ok=True)
+
+    collection_name = args.collection
+    if not collection_name:
+        while True:
+            collection_name = input("Nombre de la colección en ChromaDB (obligatorio): ").strip()
+            if collection_name:
+                break
+            print("[ERROR] Debes ingresar un nombre para la colección. Intenta de nuevo.")
+
+    # --- Inicializa el cliente de ChromaDB ---
+    try:
+        client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+        print("Cliente de ChromaDB (persistente) inicializado.")
     except Exception as e:
-        print(f"  - Error al leer el archivo JSONL '{nombre_archivo}': {e}")
-        continue
+        print(f"Error al inicializar el cliente persistente: {e}")
+        print("Intentando con un cliente efímero (en memoria)...")
+        client = chromadb.EphemeralClient()
+        print("Cliente de ChromaDB (efímero) inicializado.")
 
-if not archivos_encontrados:
-    print(f"No se encontraron archivos .jsonl en la carpeta '{documents_folder}'.")
+    # --- Embedding function (con varios procesos, cada uno carga la suya) ---
+    try:
+        if args.embedding_workers > 1:
+            embedding_fn = None
+            embedder = ParallelEmbedder(args.embedding_backend, args.embedding_model, args.embedding_workers,
+                                        args.embedding_chunk_size)
+            embedder.warm_up()
+            print(f"{args.embedding_workers} procesos de embeddings listos (backend: {args.embedding_backend}, {embedder.cores_per_worker} núcleos cada uno).")
+        else:
+            embedding_fn = get_embedding_function(args.embedding_backend, args.embedding_model)
+            embedder = ParallelEmbedder(args.embedding_backend, args.embedding_model, embedding_fn=embedding_fn)
+            print(f"Función de embedding cargada correctamente (backend: {args.embedding_backend}).")
+    except Exception as e:
+        print(f"Error al cargar la función de embedding: {e}")
+        if args.embedding_backend == "sentence-transformers":
+            print("Asegúrate de tener 'sentence-transformers' instalado y conexión a internet la primera vez.")
+        else:
+            print("Exporta antes el modelo con: python chroma_db_scripts/embedding_backends.py --export")
+        exit()
 
-BATCH_SIZE = 500
+    # --- Cache persistente de embeddings, compartida entre ejecuciones del pipeline ---
+    embedding_cache = None
+    if not args.no_embedding_cache:
+        cache_path = args.embedding_cache or default_cache_path(CHROMA_DB_PATH)
+        try:
+            embedding_cache = EmbeddingCache(cache_path, f"{args.embedding_backend}:{args.embedding_model}",
+                                             max_bytes=args.embedding_cache_max_mb * 1024 ** 2)
+            embedder = CachedEmbedder(embedder, embedding_cache)
+            print(f"Cache de embeddings en '{cache_path}' ({embedding_cache.stats()['entries']} vectores).")
+        except Exception as e:
+            print(f"Advertencia: No se pudo abrir la cache de embeddings, se calcularán todos: {e}")
+
+    # --- Parámetros del índice HNSW (Chroma solo los aplica al crear la colección) ---
+    hnsw_metadata = {
+        key: value for key, value in (
+            ("hnsw:space", args.hnsw_space),
+            ("hnsw:M", args.hnsw_m),
+            ("hnsw:construction_ef", args.hnsw_construction_ef),
+            ("hnsw:search_ef", args.hnsw_search_ef)
+        ) if value is not None
+    }
 
-if documentos_para_anadir:
+    # --- Crear o cargar la colección ---
+    # get_or_create_collection reescribiría los metadatos de una colección existente (incluido el
+    # hnsw:space que main.py usa para sus distancias) sin cambiar su índice HNSW: solo se pasan al crearla
+    existia = True
     try:
-        total_docs = len(documentos_para_anadir)
-        print(f"\nAñadiendo {total_docs} nuevos documentos a la colección '{collection_name}' en lotes de {BATCH_SIZE}...")
-        for start in range(0, total_docs, BATCH_SIZE):
-            end = min(start + BATCH_SIZE, total_docs)
-            print(f"  - Añadiendo documentos {start+1} a {end} de {total_docs}...")
-            collection.add(
-                documents=documentos_para_anadir[start:end],
-                ids=ids_para_anadir[start:end],
-                metadatas=metadatos_para_anadir[start:end]
+        try:
+            collection = client.get_collection(name=collection_name, embedding_function=embedding_fn)
+        except Exception:
+            existia = False
+            collection = client.create_collection(
+                name=collection_name,
+                embedding_function=embedding_fn,
+                metadata=hnsw_metadata or None
             )
-        archivos_nuevos_anadidos = total_docs
-        print(f"{archivos_nuevos_anadidos} nuevos documentos añadidos exitosamente.")
+        print(f"Colección '{collection_name}' {'obtenida' if existia else 'creada'}.")
+    except Exception as e:
+        print(f"Error al obtener o crear la colección '{collection_name}': {e}")
+        exit()
+    if existia:
+        guardados = collection.metadata or {}
+        distintos = {k: v for k, v in hnsw_metadata.items() if guardados.get(k, HNSW_DEFAULTS[k]) != v}
+        if distintos:
+            vigentes = {k: guardados.get(k, HNSW_DEFAULTS[k]) for k in distintos}
+            print(f"Advertencia: La colección ya existía con otros parámetros HNSW {vigentes}; se ignoran {distintos}.")
+
+    # --- Índice léxico (BM25) persistido junto a la base de ChromaDB ---
+    bm25_path = index_path(CHROMA_DB_PATH, collection_name)
+    try:
+        bm25_index = BM25Index.load_or_build(bm25_path, collection)
+        print(f"Índice BM25 cargado ({len(bm25_index)} documentos).")
     except Exception as e:
-        print(f"Error al añadir documentos desde archivos: {e}")
-else:
-    if archivos_encontrados > 0:
+        print(f"Advertencia: No se pudo abrir el índice BM25, se reconstruirá desde la colección: {e}")
+        remove_index_files(bm25_path)
+        bm25_index = BM25Index.build_from_collection(bm25_path, collection)
+    # Una carga interrumpida entre la escritura en Chroma y la del índice deja un lote sin indexar
+    if len(bm25_index) != collection.count():
+        print(f"El índice BM25 ({len(bm25_index)} documentos) no coincide con la colección ({collection.count()}); reconstruyendo...")
+        bm25_index = BM25Index.build_from_collection(bm25_path, collection)
+
+    # --- IDs existentes en la colección: se recorren por páginas en segundo plano mientras empieza la carga ---
+    existentes = ExistingIds(collection, args.dedup_max_mb * 1024 ** 2).start()
+    print(f"Recorriendo los {existentes.total} IDs existentes de la colección (filtro de {existentes.memory_bytes() / 1024 ** 2:.1f} MB).")
+    if args.sync:
+        print(f"Modo sincronización: {existentes.total} documentos ya en la colección.")
+
+    if not os.path.exists(documents_folder):
+        os.makedirs(documents_folder)
+        print(f"Carpeta '{documents_folder}' creada. Por favor, añade tus archivos .jsonl allí.")
+
+    # --- Lectura, embeddings y escritura en streaming, lote a lote ---
+    print(f"\nAñadiendo documentos de los archivos .jsonl de '{documents_folder}' a la colección '{collection_name}' en lotes de {args.batch_size}...")
+    # --- Checkpoint tras cada lote escrito, para poder reanudar con --resume ---
+    checkpoint = Checkpoint(default_checkpoint_path(CHROMA_DB_PATH, collection_name), collection_name, documents_folder)
+    if args.resume:
+        if checkpoint.load():
+            state = checkpoint.state
+            print(f"Reanudando la carga desde el checkpoint: lote {state['batch_seq']}, {state['documentos']} documentos ya escritos, "
+                  f"'{state['archivo']}' línea {state['linea']}.")
+        else:
+            print("No hay checkpoint que reanudar; la carga empieza desde el principio.")
+    elif os.path.exists(checkpoint.path):
+        print(f"Advertencia: Se descarta el checkpoint de una carga anterior ('{checkpoint.path}'); usa --resume para reanudarla.")
+    pipeline = Pipeline(args.queue_size, sync=args.sync, checkpoint=checkpoint)
+    progreso = {"añadidos": 0}
+
+    def write_batch(ids, documentos, metadatos, embeddings):
+        inicio = progreso["añadidos"]
+        print(f"  - Añadiendo documentos {inicio + 1} a {inicio + len(ids)}...")
+        if args.sync:
+            collection.upsert(documents=documentos, ids=ids, metadatas=metadatos, embeddings=embeddings)
+        else:
+            collection.add(documents=documentos, ids=ids, metadatas=metadatos, embeddings=embeddings)
+        # El índice BM25 (SQLite en disco) confirma el lote: su memoria no crece con la colección
+        bm25_index.add(ids, documentos)
+        progreso["añadidos"] += len(ids)
+
+    inicio_carga = time.perf_counter()
+    try:
+        archivos_nuevos_anadidos = pipeline.run(documents_folder, existentes, args.batch_size, embedder, write_batch)
+    finally:
+        embedder.shutdown()
+    duracion_carga = time.perf_counter() - inicio_carga
+    for etapa, error in pipeline.errors:
+        print(f"Error al añadir documentos desde archivos (etapa de {etapa}): {error}")
+    docs_omitidos = pipeline.stats["docs_omitidos"]
+
+    # --- Sincronización: borrar los documentos que ya no están en la carpeta ---
+    # Solo tras una lectura completa y sin errores; si no, faltarían IDs y se borrarían documentos vigentes.
+    eliminados = 0
+    if args.sync:
+        if pipeline.errors or pipeline.stats["archivos_con_error"]:
+            print("Advertencia: La sincronización no fue completa; no se borra ningún documento de la colección.")
+        elif pipeline.stats["lineas_invalidas"]:
+            # No se sabe qué ID tenían esas líneas: su documento parecería eliminado y se borraría
+            print(f"Advertencia: {pipeline.stats['lineas_invalidas']} líneas no son JSON válido; no se borra ningún documento de la colección.")
+        elif checkpoint.resumed:
+            # Los registros anteriores al checkpoint no se han releído: no se sabe cuáles siguen vigentes
+            print("Advertencia: Carga reanudada; los documentos obsoletos se borrarán en la próxima sincronización completa.")
+        else:
+            try:
+                # Se recogen antes de borrar para no desplazar las páginas del recorrido
+                obsoletos = []
+                for ids in iter_collection_ids(collection):
+                    obsoletos.extend(doc_id for doc_id, leido in zip(ids, pipeline.ids_leidos.contains(id_hashes(ids))) if not leido)
+                for start in range(0, len(obsoletos), args.batch_size):
+                    chunk = obsoletos[start:start + args.batch_size]
+                    collection.delete(ids=chunk)
+                    bm25_index.remove(chunk)
+                    eliminados += len(chunk)
+            except Exception as e:
+                print(f"Error al borrar documentos obsoletos de la colección: {e}")
+            if eliminados:
+                print(f"{eliminados} documentos eliminados (ya no están en '{documents_folder}').")
+
+    if not pipeline.stats["archivos_encontrados"]:
+        print(f"No se encontraron archivos .jsonl en la carpeta '{documents_folder}'.")
+    elif archivos_nuevos_anadidos:
+        print(f"{archivos_nuevos_anadidos} nuevos documentos añadidos exitosamente.")
+    elif not pipeline.errors:
         print("\nNo hay nuevos documentos de archivos para añadir a la colección.")
-print(f"Total de documentos en la colección '{collection_name}' ahora: {collection.count()}")
+    if archivos_nuevos_anadidos or eliminados:
+        # Cada lote ya quedó confirmado en el índice junto con su escritura en Chroma
+        print(f"Índice BM25 actualizado en '{bm25_path}' ({len(bm25_index)} documentos).")
+    print(f"Total de documentos en la colección '{collection_name}' ahora: {collection.count()}")
+    if pipeline.errors:
+        print(f"Checkpoint guardado en '{checkpoint.path}' (lote {checkpoint.state['batch_seq']}); vuelve a ejecutar con --resume para continuar.")
+    else:
+        checkpoint.clear()
 
-print(f"\nResumen: {archivos_nuevos_anadidos} documentos añadidos, {docs_omitidos} documentos omitidos por formato incorrecto.")
+    print(f"\nResumen: {archivos_nuevos_anadidos} documentos añadidos, {docs_omitidos} documentos omitidos por formato incorrecto.")
+    if args.sync:
+        print(f"Sincronización: {pipeline.stats['nuevos']} nuevos, {pipeline.stats['modificados']} modificados, "
+              f"{pipeline.stats['sin_cambios']} sin cambios, {eliminados} eliminados.")
+    if embedding_cache is not None:
+        stats = embedding_cache.stats()
+        print(f"Cache de embeddings: {stats['hits']} aciertos, {stats['misses']} calculados (tasa de acierto {stats['hit_rate']:.1%}), "
+              f"{stats['evictions']} expulsados, {stats['entries']} vectores / {stats['size_mb']} MB en disco.")
+        embedding_cache.close()
+    if archivos_nuevos_anadidos:
+        print(f"Velocidad de carga: {archivos_nuevos_anadidos / duracion_carga:.1f} docs/s ({args.embedding_workers} proceso(s) de embeddings).")
 
-try:
-    print("\nColecciones en la base de datos:")
-    collections_list = client.list_collections()
-    if not collections_list:
-        print("  No hay colecciones en la base de datos.")
-    for coll_obj in collections_list:
-        print(f"  - Nombre: {coll_obj.name}, ID: {coll_obj.id}, Documentos: {coll_obj.count()}")
-except Exception as e:
-    print(f"Error al listar colecciones: {e}")
 
-print("\n¡Proceso de carga de documentos completado!")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import os
+import re
+import sqlite3
+import threading
+
+# Tokens "compuestos" (claves de Jira, códigos de error, nombres de config) se conservan enteros
+# y además se indexan sus partes: "PRODU-51415" -> "produ-51415", "produ", "51415".
+# [^\W_] es cualquier letra o dígito Unicode: "índice" o "producción" no pierden sus tildes ni la ñ
+TOKEN_RE = re.compile(r"[^\W_](?:[\w.\-:/]*[^\W_])?")
+SPLIT_RE = re.compile(r"[_.\-:/]+")
+# Una consulta que es un solo identificador compuesto (clave de Jira, código de error) se busca
+# como token exacto, sin sumar las coincidencias de sus partes sueltas
+IDENTIFIER_RE = re.compile(r"[^\W_]+(?:[_.\-:/]+[^\W_]+)+")
+# Los documentos se guardan ya tokenizados (tokens separados por espacios y en minúsculas): el
+# tokenizador de FTS5 solo tiene que respetar los caracteres internos de los tokens compuestos
+FTS_TOKENIZER = "unicode61 remove_diacritics 0 tokenchars '_.-:/'"
+SQLITE_MAX_VARIABLES = 900
+# Versión de la tokenización (PRAGMA user_version del fichero): los índices con otra versión se
+# reconstruyen al abrirlos con load_or_build. 2: tokens Unicode (la 1 solo reconocía ASCII)
+INDEX_VERSION = 2
+
+
+def tokenize(text):
+    tokens = []
+    for match in TOKEN_RE.findall(text or ""):
+        token = match.lower()
+        tokens.append(token)
+        parts = SPLIT_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+
+def identifier_token(query):
+    """Si la consulta es un único identificador con algún dígito (p. ej. "PRODU-51415"), lo devuelve en minúsculas."""
+    query = (query or "").strip()
+    if IDENTIFIER_RE.fullmatch(query) and any(ch.isdigit() for ch in query):
+        return query.lower()
+    return None
+
+
+def index_path(db_path, collection_name):
+    """Ruta del índice léxico de una colección, junto a la base de ChromaDB."""
+    return os.path.join(db_path, "bm25", f"{collection_name}.sqlite")
+
+
+def remove_index_files(path):
+    """Borra el índice y los ficheros auxiliares de SQLite (-wal, -shm). Devuelve si existía."""
+    existia = os.path.exists(path)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return existia
+
+
+def _match_expression(tokens):
+    return " OR ".join(f'"{token}"' for token in dict.fromkeys(tokens))
+
+
+class BM25Index:
+    """
+    Índice invertido BM25 en disco (tabla SQLite FTS5, puntuación bm25() con k1=1.2 y b=0.75): la
+    memoria no crece con la colección y cada proceso que abre el fichero ve lo último confirmado.
+    La tabla `ids` asigna a cada ID de Chroma el rowid de sus términos en la tabla FTS5 `terms`.
+    Cada hilo usa su propia conexión; add/remove confirman una transacción por llamada.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            nuevo = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'terms'").fetchone() is None
+            conn.execute("CREATE TABLE IF NOT EXISTS ids (rowid INTEGER PRIMARY KEY, doc_id TEXT NOT NULL UNIQUE)")
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(tokens, tokenize=\"{FTS_TOKENIZER}\")")
+            if nuevo:
+                conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def outdated(self):
+        """Si el índice se tokenizó con otra versión de tokenize() y hay que reconstruirlo."""
+        return self._conn().execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION
+
+    def __len__(self):
+        return self._conn().execute("SELECT count(*) FROM ids").fetchone()[0]
+
+    def add(self, ids, documents):
+        """Añade (o reemplaza) documentos de forma incremental."""
+        with self._conn() as conn:
+            self._add(conn, ids, documents)
+
+    def _add(self, conn, ids, documents):
+        tokens = {doc_id: " ".join(tokenize(text)) for doc_id, text in zip(ids, documents)}
+        existing = self._rowids(conn, list(tokens))
+        conn.executemany("DELETE FROM terms WHERE rowid = ?", [(rowid,) for rowid in existing.values()])
+        # Dentro de la transacción de escritura nadie más puede asignar rowids
+        next_rowid = conn.execute("SELECT coalesce(max(rowid), 0) + 1 FROM ids").fetchone()[0]
+        new_rows = []
+        for doc_id in tokens:
+            if doc_id not in existing:
+                existing[doc_id] = next_rowid
+                new_rows.append((next_rowid, doc_id))
+                next_rowid += 1
+        conn.executemany("INSERT INTO ids (rowid, doc_id) VALUES (?, ?)", new_rows)
+        conn.executemany("INSERT INTO terms (rowid, tokens) VALUES (?, ?)",
+                         [(existing[doc_id], text) for doc_id, text in tokens.items()])
+
+    def _rowids(self, conn, ids):
+        rowids = {}
+        for start in range(0, len(ids), SQLITE_MAX_VARIABLES):
+            chunk = ids[start:start + SQLITE_MAX_VARIABLES]
+            rowids.update(conn.execute(f"SELECT doc_id, rowid FROM ids WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk))
+        return rowids
+
+    def remove(self, ids):
+        with self._conn() as conn:
+            rows = [(rowid,) for rowid in self._rowids(conn, list(ids)).values()]
+            conn.executemany("DELETE FROM terms WHERE rowid = ?", rows)
+            conn.executemany("DELETE FROM ids WHERE rowid = ?", rows)
+
+    def search(self, query, n_results=10, candidates=None):
+        """Devuelve [(doc_id, score)] ordenado por puntuación BM25 descendente."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        return self._ranked(_match_expression(tokens), n_results, candidates)
+
+    def lookup(self, token, n_results=10, candidates=None):
+        """Búsqueda exacta de un token (p. ej. una clave de Jira): [(doc_id, score)] de los documentos que lo contienen."""
+        return self._ranked(_match_expression([token.lower()]), n_results, candidates)
+
+    def _ranked(self, match, n_results, candidates):
+        conn = self._conn()
+        allowed = None
+        if candidates is not None:
+            # Los filtros se aplican sobre rowids, recorriendo el ranking hasta reunir n_results
+            allowed = set(self._rowids(conn, list(candidates)).values())
+            if not allowed:
+                return []
+        sql = "SELECT rowid, -rank FROM terms WHERE terms MATCH ? ORDER BY rank"
+        params = (match,)
+        if allowed is None:
+            sql += " LIMIT ?"
+            params += (n_results,)
+        hits = []
+        for rowid, score in conn.execute(sql, params):
+            if allowed is not None and rowid not in allowed:
+                continue
+            hits.append((rowid, score))
+            if len(hits) == n_results:
+                break
+        if not hits:
+            return []
+        rowids = [rowid for rowid, _ in hits]
+        doc_ids = dict(conn.execute(f"SELECT rowid, doc_id FROM ids WHERE rowid IN ({','.join('?' * len(rowids))})", rowids))
+        return [(doc_ids[rowid], score) for rowid, score in hits if rowid in doc_ids]
+
+    @classmethod
+    def build_from_collection(cls, path, collection, page_size=5000):
+        """
+        (Re)construye el índice paginando los documentos ya guardados en la colección, en una sola
+        transacción: quien tenga el fichero abierto sigue viendo el índice anterior hasta el final.
+        """
+        index = cls(path)
+        with index._conn() as conn:
+            conn.execute("DELETE FROM terms")
+            conn.execute("DELETE FROM ids")
+            offset = 0
+            while True:
+                page = collection.get(include=["documents"], limit=page_size, offset=offset)
+                if not page["ids"]:
+                    break
+                index._add(conn, page["ids"], [doc or "" for doc in page["documents"]])
+                offset += len(page["ids"])
+            conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        return index
+
+    @classmethod
+    def load_or_build(cls, path, collection):
+        if os.path.exists(path) or collection.count() == 0:
+            index = cls(path)
+            if not index.outdated or collection.count() == 0:
+                return index
+            print(f"El índice BM25 '{path}' usa una tokenización anterior; reconstruyendo...")
+        return cls.build_from_collection(path, collection)
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fusiona varias listas ordenadas de IDs con RRF. Devuelve [(doc_id, score)] ordenado."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
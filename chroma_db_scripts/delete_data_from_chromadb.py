@@ -5,6 +5,7 @@ import chromadb
 from chromadb.config import Settings # Importar Settings
 import os
 import shutil # Para borrar la carpeta si es necesario después del reset
+from bm25_index import index_path, remove_index_files
 
 # --- CONFIGURACIÓN ---
 # Ruta a la carpeta de tu base de datos ChromaDB persistente
@@ -50,6 +51,9 @@ def borrar_coleccion(db_path):
     try:
         client.delete_collection(nombre_coleccion)
         print(f"¡Colección '{nombre_coleccion}' eliminada exitosamente!")
+        ruta_bm25 = index_path(db_path, nombre_coleccion)
+        if remove_index_files(ruta_bm25):
+            print(f"Índice BM25 '{ruta_bm25}' eliminado.")
     except Exception as e:
         print(f"Ocurrió un error al intentar borrar la colección: {e}")
 
@@ -0,0 +1,191 @@
+import os
+import json
+import argparse
+from chromadb.api.types import EmbeddingFunction
+
+# Backends disponibles:
+#   sentence-transformers  PyTorch fp32 (lo que se usaba hasta ahora)
+#   onnx                   modelo exportado a ONNX Runtime (fp32)
+#   onnx-int8              modelo ONNX con cuantización dinámica a int8
+EMBEDDING_BACKENDS = ("sentence-transformers", "onnx", "onnx-int8")
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+def default_onnx_dir(model_name):
+    return os.path.join("models", f"{model_name.replace('/', '_')}-onnx")
+
+
+class OnnxEmbeddingFunction(EmbeddingFunction):
+    """
+    Función de embedding compatible con ChromaDB sobre ONNX Runtime: tokeniza con `tokenizers`,
+    ejecuta el transformer y aplica mean pooling + normalización L2 (igual que sentence-transformers
+    para all-MiniLM-L6-v2). No importa torch.
+    """
+
+    def __init__(self, model_dir, quantized=False, batch_size=32, max_length=256, threads=None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        config_path = os.path.join(model_dir, "embedding_config.json")
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        self.max_length = config.get("max_length", max_length)
+        self.normalize = config.get("normalize", True)
+        self.batch_size = batch_size
+
+        model_file = "model_quantized.onnx" if quantized else "model.onnx"
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, model_file), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        self.tokenizer.enable_padding()
+
+    def _encode_batch(self, texts):
+        import numpy as np
+
+        encoded = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encoded], dtype=np.int64)
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+    def __call__(self, input):
+        # Agrupa por longitud para minimizar el padding dentro de cada lote
+        order = sorted(range(len(input)), key=lambda i: len(input[i]))
+        result = [None] * len(input)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            embeddings = self._encode_batch([input[i] for i in batch])
+            for i, emb in zip(batch, embeddings):
+                result[i] = emb.tolist()
+        return result
+
+
+def get_embedding_function(backend=None, model_name=None, onnx_dir=None, threads=None):
+    """
+    Devuelve la función de embedding configurada. Por defecto lee EMBEDDING_BACKEND,
+    EMBEDDING_MODEL y EMBEDDING_ONNX_DIR del entorno. `threads` limita los hilos de
+    ONNX Runtime (con sentence-transformers se controla con torch.set_num_threads).
+    """
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+    model_name = model_name or os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL)
+    if backend == "sentence-transformers":
+        from chromadb.utils import embedding_functions
+        return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+    if backend in ("onnx", "onnx-int8"):
+        onnx_dir = onnx_dir or os.getenv("EMBEDDING_ONNX_DIR") or default_onnx_dir(model_name)
+        return OnnxEmbeddingFunction(onnx_dir, quantized=backend == "onnx-int8", threads=threads)
+    raise ValueError(f"Backend de embedding '{backend}' no soportado. Opciones: {', '.join(EMBEDDING_BACKENDS)}")
+
+
+def export_onnx(model_name, output_dir, quantize=True, max_length=256):
+    """Exporta el transformer de sentence-transformers a ONNX y, opcionalmente, lo cuantiza a int8."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    hf_name = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(hf_name)
+    model = AutoModel.from_pretrained(hf_name).eval()
+
+    dummy = tokenizer(["Texto de ejemplo para exportar"], return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+    dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    model_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(dummy[n] for n in input_names), model_path,
+            input_names=input_names, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes, opset_version=14
+        )
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, "embedding_config.json"), "w", encoding="utf-8") as f:
+        json.dump({"model_name": model_name, "max_length": max_length, "normalize": True}, f, indent=2)
+    print(f"Modelo ONNX exportado en '{model_path}'.")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_path = os.path.join(output_dir, "model_quantized.onnx")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Modelo cuantizado (int8) guardado en '{quantized_path}'.")
+
+
+def parity_check(reference_fn, candidate_fn, texts):
+    """Compara dos funciones de embedding: deriva coseno (1 - similitud) media, p99 y máxima."""
+    import numpy as np
+
+    reference = np.asarray(reference_fn(texts), dtype=np.float32)
+    candidate = np.asarray(candidate_fn(texts), dtype=np.float32)
+    reference /= np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    candidate /= np.clip(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12, None)
+    drift = 1.0 - (reference * candidate).sum(axis=1)
+    return {
+        "texts": len(texts),
+        "mean_cosine_drift": float(drift.mean()),
+        "p99_cosine_drift": float(np.percentile(drift, 99)),
+        "max_cosine_drift": float(drift.max())
+    }
+
+
+def load_sample_texts(documents_dir, limit):
+    """Lee hasta `limit` textos (título + contenido, como el loader) de los .jsonl de una carpeta."""
+    texts = []
+    for nombre_archivo in sorted(os.listdir(documents_dir)):
+        if not nombre_archivo.lower().endswith(".jsonl"):
+            continue
+        with open(os.path.join(documents_dir, nombre_archivo), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    doc = json.loads(line)
+                except Exception:
+                    continue
+                texts.append(f"{doc.get('title')}\n\n{doc.get('content')}")
+                if len(texts) >= limit:
+                    return texts
+    return texts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta el modelo de embeddings a ONNX (opcionalmente int8) y comprueba su paridad con el modelo fp32 de PyTorch.")
+    parser.add_argument('--model', type=str, default=os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL), help='Modelo de sentence-transformers')
+    parser.add_argument('--output-dir', type=str, default=None, help='Carpeta del modelo ONNX (default: models/<modelo>-onnx)')
+    parser.add_argument('--export', action='store_true', help='Exportar el modelo a ONNX')
+    parser.add_argument('--no-quantize', action='store_true', help='No generar la variante int8 al exportar')
+    parser.add_argument('--parity', action='store_true', help='Medir la deriva coseno de los backends ONNX frente al modelo fp32')
+    parser.add_argument('--documents-dir', type=str, default=None, help='Carpeta .jsonl de la que tomar textos para la comprobación de paridad')
+    parser.add_argument('--samples', type=int, default=500, help='Número de textos para la comprobación de paridad')
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or default_onnx_dir(args.model)
+    if args.export:
+        export_onnx(args.model, output_dir, quantize=not args.no_quantize)
+    if args.parity:
+        if args.documents_dir:
+            texts = load_sample_texts(args.documents_dir, args.samples)
+        else:
+            texts = ["¿Cómo se configura el entorno de QA?", "Error 500 al iniciar sesión", "PRODU-51415", "Pasos para desplegar en producción"]
+        reference = get_embedding_function("sentence-transformers", args.model)
+        for backend in ("onnx", "onnx-int8"):
+            try:
+                report = parity_check(reference, get_embedding_function(backend, args.model, output_dir), texts)
+            except Exception as e:
+                print(f"[{backend}] No se pudo comprobar la paridad: {e}")
+                continue
+            print(f"[{backend}] {json.dumps(report)}")
+    if not args.export and not args.parity:
+        parser.print_help()
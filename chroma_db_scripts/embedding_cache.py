@@ -0,0 +1,153 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def default_cache_path(db_path):
+    return os.path.join(db_path, "embedding_cache.sqlite3")
+
+
+def normalize_text(text):
+    """Normalización previa al hash: Unicode NFC y espacios colapsados (no cambia el embedding)."""
+    return WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+class EmbeddingCache:
+    """
+    Cache persistente de embeddings direccionada por contenido: clave = sha256(modelo + texto
+    normalizado), valor = vector float32. Vive en un SQLite junto a la base de ChromaDB y se
+    comparte entre ejecuciones del pipeline; al superar `max_bytes` se expulsan las entradas
+    usadas hace más tiempo.
+    """
+
+    def __init__(self, path, model_id, max_bytes=2 * 1024 ** 3):
+        self.path = path
+        self.model_id = model_id
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_id}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+    def get_many(self, texts):
+        """Devuelve una lista con el embedding de cada texto (None si no está en la cache)."""
+        keys = [self.key(t) for t in texts]
+        found = {}
+        with self._lock:
+            # Consultas por tramos para no pasar del límite de parámetros de SQLite
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = int(time.time())
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+                self._conn.commit()
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return [np.frombuffer(found[k], dtype=np.float32).tolist() if k in found else None for k in keys]
+
+    def put_many(self, texts, embeddings):
+        now = int(time.time())
+        rows = [(self.key(t), np.asarray(e, dtype=np.float32).tobytes(), now) for t, e in zip(texts, embeddings)]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            # Todos los vectores de un modelo tienen la misma dimensión
+            self._bytes += (self._conn.total_changes - before) * len(rows[0][1]) if rows else 0
+            self._conn.commit()
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Expulsa las entradas menos usadas recientemente hasta quedar en el 90% del límite."""
+        target = int(self.max_bytes * 0.9)
+        while self._bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._bytes = 0
+                break
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", [(k,) for k, _ in rows])
+            self._bytes -= sum(size for _, size in rows)
+            self.evictions += len(rows)
+        self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_mb": round(self._bytes / 1024 ** 2, 1)
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _CachedResult:
+    def __init__(self, cache, texts, cached, misses, pending):
+        self.cache = cache
+        self.texts = texts
+        self.cached = cached
+        self.misses = misses
+        self.pending = pending
+
+    def done(self):
+        return self.pending is None or self.pending.done()
+
+    def result(self):
+        embeddings = list(self.cached)
+        if self.pending is not None:
+            computed = self.pending.result()
+            for i, emb in zip(self.misses, computed):
+                embeddings[i] = emb
+            self.cache.put_many([self.texts[i] for i in self.misses], computed)
+        return embeddings
+
+
+class CachedEmbedder:
+    """Envuelve un embedder con submit()/result() (ParallelEmbedder): solo calcula los textos que no están en la cache."""
+
+    def __init__(self, embedder, cache):
+        self.embedder = embedder
+        self.cache = cache
+        self.workers = embedder.workers
+        self.chunk_size = embedder.chunk_size
+
+    def submit(self, texts):
+        cached = self.cache.get_many(texts)
+        misses = [i for i, emb in enumerate(cached) if emb is None]
+        pending = self.embedder.submit([texts[i] for i in misses]) if misses else None
+        return _CachedResult(self.cache, texts, cached, misses, pending)
+
+    def shutdown(self):
+        self.embedder.shutdown()
@@ -2,9 +2,12 @@ import chromadb
 import os
 import json
 import argparse
+from parquet_io import metadata_types, write_parquet
 
 CHROMA_DB_PATH = "./my_chroma_db"
 FRAGMENT_SIZE_BYTES = 10 * 1024 * 1024  # 10 MB
+PAGE_SIZE = 1000  # Documentos leídos de ChromaDB por consulta
+WRITE_BUFFER_BYTES = 1024 * 1024
 
 def get_fragmented_output_paths(base_output_file, extension):
     base, _ = os.path.splitext(base_output_file)
@@ -12,104 +15,97 @@ def get_fragmented_output_paths(base_output_file, extension):
         return f"{base}_part_{idx}.{extension}"
     return path
 
-def exportar_a_jsonl(data, output_file):
-    with open(output_file, 'w', encoding='utf-8') as f:
+def iter_paginas(collection, page_size=PAGE_SIZE, include=('documents', 'metadatas')):
+    """Recorre la colección por páginas de `page_size` documentos (limit/offset) para no cargarla entera en memoria."""
+    offset = 0
+    while True:
+        page = collection.get(include=list(include), limit=page_size, offset=offset)
+        if not page['ids']:
+            return
+        yield page
+        offset += len(page['ids'])
+
+def iter_documentos(paginas):
+    """(id, contenido, metadatos) de cada documento de las páginas."""
+    for data in paginas:
         for i in range(len(data['ids'])):
+            content = data['documents'][i] if data.get('documents') and data['documents'][i] else ""
+            metadata = data['metadatas'][i] if data.get('metadatas') and data['metadatas'][i] else {}
+            yield data['ids'][i], content, metadata
+
+def exportar_a_jsonl(paginas, output_file):
+    with open(output_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_BYTES) as f:
+        for doc_id, content, metadata in iter_documentos(paginas):
             doc = {
-                "id": data['ids'][i],
-                "content": data['documents'][i] if data.get('documents') and data['documents'][i] else ""
+                "id": doc_id,
+                "content": content
             }
-            metadata = data['metadatas'][i] if data.get('metadatas') and data['metadatas'][i] else {}
             # Incluir todos los metadatos relevantes excepto id y content
             for k, v in metadata.items():
                 if k not in {"id", "content"}:
                     doc[k] = v
             f.write(json.dumps(doc, ensure_ascii=False) + "\n")
 
-def exportar_a_txt(data, output_file):
-    path_fn = get_fragmented_output_paths(output_file, 'txt')
-    fragment_idx = 1
-    buffer = ""
-    buffer_size = 0
-    for i in range(len(data['ids'])):
-        doc_id = data['ids'][i]
-        content = data['documents'][i] if data.get('documents') and data['documents'][i] else ""
-        metadata = data['metadatas'][i] if data.get('metadatas') and data['metadatas'][i] else {}
-        title = metadata.get('title', '') or metadata.get('summary', '')
-        doc_txt = f"--- Documento: {doc_id} ---\n"
-        if title and not content.strip().startswith(title):
-            doc_txt += f"Título: {title}\n"
-        for k, v in metadata.items():
-            if k not in {"id", "content", "title", "summary"}:
-                doc_txt += f"{k}: {v}\n"
-        doc_txt += content.strip() + "\n\n"
-        doc_bytes = doc_txt.encode('utf-8')
-        # Si el documento solo ya excede el fragmento, escríbelo solo
-        if len(doc_bytes) > FRAGMENT_SIZE_BYTES:
-            if buffer:
-                with open(path_fn(fragment_idx), 'w', encoding='utf-8') as f:
-                    f.write(buffer)
-                fragment_idx += 1
-                buffer = ""
-                buffer_size = 0
-            with open(path_fn(fragment_idx), 'w', encoding='utf-8') as f:
-                f.write(doc_txt)
-            fragment_idx += 1
-        else:
-            if buffer_size + len(doc_bytes) > FRAGMENT_SIZE_BYTES:
-                with open(path_fn(fragment_idx), 'w', encoding='utf-8') as f:
-                    f.write(buffer)
-                fragment_idx += 1
-                buffer = ""
-                buffer_size = 0
-            buffer += doc_txt
-            buffer_size += len(doc_bytes)
-    if buffer:
-        with open(path_fn(fragment_idx), 'w', encoding='utf-8') as f:
-            f.write(buffer)
-
-def exportar_a_md(data, output_file):
-    path_fn = get_fragmented_output_paths(output_file, 'md')
-    fragment_idx = 1
-    buffer = ""
-    buffer_size = 0
-    for i in range(len(data['ids'])):
-        doc_id = data['ids'][i]
-        content = data['documents'][i] if data.get('documents') and data['documents'][i] else ""
-        metadata = data['metadatas'][i] if data.get('metadatas') and data['metadatas'][i] else {}
-        title = metadata.get('title', '') or metadata.get('summary', '') or doc_id
-        doc_md = f"# {title}\n\n"
-        doc_md += f"**ID:** {doc_id}  "
-        for k, v in metadata.items():
-            if k not in {"id", "content", "title", "summary"}:
-                doc_md += f"**{k}:** {v}  "
-        doc_md += "\n\n---\n\n"
-        doc_md += content.strip() + "\n\n---\n\n"
-        doc_bytes = doc_md.encode('utf-8')
-        if len(doc_bytes) > FRAGMENT_SIZE_BYTES:
-            if buffer:
-                with open(path_fn(fragment_idx), 'w', encoding='utf-8') as f:
-                    f.write(buffer)
-                fragment_idx += 1
-                buffer = ""
-                buffer_size = 0
-            with open(path_fn(fragment_idx), 'w', encoding='utf-8') as f:
-                f.write(doc_md)
-            fragment_idx += 1
-        else:
-            if buffer_size + len(doc_bytes) > FRAGMENT_SIZE_BYTES:
-                with open(path_fn(fragment_idx), 'w', encoding='utf-8') as f:
-                    f.write(buffer)
+def documento_a_txt(doc_id, content, metadata):
+    title = metadata.get('title', '') or metadata.get('summary', '')
+    partes = [f"--- Documento: {doc_id} ---\n"]
+    if title and not content.strip().startswith(title):
+        partes.append(f"Título: {title}\n")
+    for k, v in metadata.items():
+        if k not in {"id", "content", "title", "summary"}:
+            partes.append(f"{k}: {v}\n")
+    partes.append(content.strip() + "\n\n")
+    return "".join(partes)
+
+def documento_a_md(doc_id, content, metadata):
+    title = metadata.get('title', '') or metadata.get('summary', '') or doc_id
+    partes = [f"# {title}\n\n", f"**ID:** {doc_id}  "]
+    for k, v in metadata.items():
+        if k not in {"id", "content", "title", "summary"}:
+            partes.append(f"**{k}:** {v}  ")
+    partes.append("\n\n---\n\n")
+    partes.append(content.strip() + "\n\n---\n\n")
+    return "".join(partes)
+
+def exportar_fragmentado(paginas, output_file, extension, formatear):
+    """
+    Escribe los documentos en partes de hasta FRAGMENT_SIZE_BYTES. Cada documento se escribe en
+    cuanto se formatea (a través del buffer de escritura del archivo), sin acumular la parte en memoria.
+    """
+    path_fn = get_fragmented_output_paths(output_file, extension)
+    fragment_idx = 0
+    f = None
+    part_size = 0
+    try:
+        for doc_id, content, metadata in iter_documentos(paginas):
+            doc_txt = formatear(doc_id, content, metadata)
+            doc_size = len(doc_txt.encode('utf-8'))
+            # Parte nueva si el documento no cabe en la actual (un documento mayor que el fragmento va solo)
+            if f is None or (part_size and part_size + doc_size > FRAGMENT_SIZE_BYTES):
+                if f is not None:
+                    f.close()
                 fragment_idx += 1
-                buffer = ""
-                buffer_size = 0
-            buffer += doc_md
-            buffer_size += len(doc_bytes)
-    if buffer:
-        with open(path_fn(fragment_idx), 'w', encoding='utf-8') as f:
-            f.write(buffer)
-
-def exportar_coleccion(db_path, collection_name, output_file, formato="jsonl"):
+                f = open(path_fn(fragment_idx), 'w', encoding='utf-8', buffering=WRITE_BUFFER_BYTES)
+                part_size = 0
+            f.write(doc_txt)
+            part_size += doc_size
+    finally:
+        if f is not None:
+            f.close()
+
+def exportar_a_txt(paginas, output_file):
+    exportar_fragmentado(paginas, output_file, 'txt', documento_a_txt)
+
+def exportar_a_md(paginas, output_file):
+    exportar_fragmentado(paginas, output_file, 'md', documento_a_md)
+
+def exportar_a_parquet(collection, paginas, output_file, page_size=PAGE_SIZE):
+    """Parquet con embeddings (ver parquet_io.py); una pasada previa solo por metadatos fija sus columnas."""
+    tipos = metadata_types(iter_paginas(collection, page_size, include=('metadatas',)))
+    file_metadata = {"collection": collection.name, "collection_metadata": collection.metadata or {}}
+    write_parquet(paginas, output_file, tipos, file_metadata)
+
+def exportar_coleccion(db_path, collection_name, output_file, formato="jsonl", page_size=PAGE_SIZE):
     print(f"Intentando conectar a la base de datos ChromaDB en: {db_path}")
     try:
         client = chromadb.PersistentClient(path=db_path)
@@ -128,38 +124,51 @@ def exportar_coleccion(db_path, collection_name, output_file, formato="jsonl"):
 
     if collection.count() == 0:
         print(f"La colección '{collection_name}' está vacía. No hay nada que exportar.")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            pass
+        if formato == "parquet":
+            # Un parquet de 0 bytes no se puede leer: se escribe el esquema sin filas
+            exportar_a_parquet(collection, iter(()), output_file, page_size)
+        else:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                pass
         print(f"Archivo de salida '{output_file}' creado (vacío).")
         return
 
-    print(f"\nExtrayendo documentos de la colección '{collection_name}'...")
-    try:
-        data = collection.get(
-            include=['documents', 'metadatas']
-        )
-    except Exception as e:
-        print(f"Error al extraer datos de la colección: {e}")
+    exportadores = {
+        "jsonl": exportar_a_jsonl,
+        "txt": exportar_a_txt,
+        "md": exportar_a_md,
+        "parquet": lambda paginas, output_file: exportar_a_parquet(collection, paginas, output_file, page_size)
+    }
+    if formato not in exportadores:
+        print(f"Formato '{formato}' no soportado.")
         return
 
-    print(f"Exportando {len(data['ids'])} documentos en formato {formato}...")
+    total = collection.count()
+    print(f"\nExportando {total} documentos de la colección '{collection_name}' en formato {formato}, en páginas de {page_size}...")
+    exportados = 0
+    # Solo el formato parquet guarda los embeddings (permite restaurar sin recalcularlos)
+    include = ('documents', 'metadatas', 'embeddings') if formato == "parquet" else ('documents', 'metadatas')
 
-    if formato == "jsonl":
-        exportar_a_jsonl(data, output_file)
-    elif formato == "txt":
-        exportar_a_txt(data, output_file)
-    elif formato == "md":
-        exportar_a_md(data, output_file)
-    else:
-        print(f"Formato '{formato}' no soportado.")
+    def paginas():
+        nonlocal exportados
+        for page in iter_paginas(collection, page_size, include):
+            yield page
+            exportados += len(page['ids'])
+            print(f"  - {exportados}/{total} documentos exportados...")
+
+    try:
+        exportadores[formato](paginas(), output_file)
+    except Exception as e:
+        print(f"Error al extraer datos de la colección: {e}")
         return
 
-    print(f"\n¡Exportación completada! {len(data['ids'])} documentos guardados en '{output_file}'.")
+    print(f"\n¡Exportación completada! {exportados} documentos guardados en '{output_file}'.")
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Exporta una colección de ChromaDB a un archivo .jsonl, .txt o .md. Ejemplo de uso: --output-file data/export/20240613_xxxx/mi_coleccion.jsonl")
+    parser = argparse.ArgumentParser(description="Exporta una colección de ChromaDB a un archivo .jsonl, .txt, .md o .parquet (con embeddings). Ejemplo de uso: --output-file data/export/20240613_xxxx/mi_coleccion.jsonl")
     parser.add_argument('--output-file', type=str, default=None, help='Ruta del archivo de salida')
     parser.add_argument('--collection', type=str, default=None, help='Nombre de la colección a exportar')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help='Documentos leídos de ChromaDB por consulta')
     args, unknown = parser.parse_known_args()
 
     if not os.path.exists(CHROMA_DB_PATH):
@@ -172,11 +181,13 @@ if __name__ == "__main__":
                 formato = 'txt'
             elif args.output_file and args.output_file.endswith('.md'):
                 formato = 'md'
+            elif args.output_file and args.output_file.endswith('.parquet'):
+                formato = 'parquet'
             output_file = args.output_file if args.output_file else f"{collection_name}.{formato}"
             output_dir = os.path.dirname(output_file)
             if output_dir:
                 os.makedirs(output_dir, exist_ok=True)
-            exportar_coleccion(CHROMA_DB_PATH, collection_name, output_file, formato=formato)
+            exportar_coleccion(CHROMA_DB_PATH, collection_name, output_file, formato=formato, page_size=args.page_size)
         else:
             # Inicializa el cliente para listar colecciones
             try:
@@ -202,16 +213,17 @@ if __name__ == "__main__":
             # Selección de formato
             opciones = [("jsonl", "Exportar como JSONL (recomendado para IA)"),
                         ("txt", "Exportar como texto plano (.txt)"),
-                        ("md", "Exportar como Markdown (.md)")]
+                        ("md", "Exportar como Markdown (.md)"),
+                        ("parquet", "Exportar como Parquet con embeddings (backup / migración)")]
             print("Selecciona el formato de exportación:")
             for idx, (_, desc) in enumerate(opciones, 1):
                 print(f"  {idx}. {desc}")
-            seleccion = input("Opción (1/2/3): ").strip()
+            seleccion = input("Opción (1/2/3/4): ").strip()
             try:
                 idx = int(seleccion) - 1
                 formato = opciones[idx][0]
             except (ValueError, IndexError):
-                print("Selección no válida. Usa 1, 2 o 3.")
+                print("Selección no válida. Usa 1, 2, 3 o 4.")
             else:
                 if args.output_file:
                     output_file = args.output_file
@@ -220,4 +232,4 @@ if __name__ == "__main__":
                 output_dir = os.path.dirname(output_file)
                 if output_dir:
                     os.makedirs(output_dir, exist_ok=True)
-                exportar_coleccion(CHROMA_DB_PATH, collection_name, output_file, formato=formato)
\ No newline at end of file
+                exportar_coleccion(CHROMA_DB_PATH, collection_name, output_file, formato=formato, page_size=args.page_size)
\ No newline at end of file
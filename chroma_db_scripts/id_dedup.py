@@ -0,0 +1,138 @@
+import math
+import hashlib
+import threading
+import numpy as np
+
+
+def id_hashes(ids):
+    """Hash de 64 bits de cada ID (blake2b), como array uint64."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest(), "little") for doc_id in ids),
+        dtype=np.uint64, count=len(ids)
+    )
+
+
+def iter_collection_ids(collection, page_size=5000):
+    """Recorre los IDs de la colección por páginas, sin traer documentos, metadatos ni embeddings."""
+    offset = 0
+    while True:
+        page = collection.get(include=[], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page["ids"]
+        offset += len(page["ids"])
+
+
+class SeenIds:
+    """
+    IDs leídos en esta carga, guardados como hashes de 64 bits en arrays ordenados (8 bytes por ID).
+    Cada lote añade un array; los de tamaño parecido se fusionan (como un contador binario), así
+    que hay O(log n) arrays y cada consulta es un searchsorted por array.
+    """
+
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            idx = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            found |= run[idx] == hashes
+        return found
+
+    def add(self, hashes):
+        if not len(hashes):
+            return
+        self.runs.append(np.sort(hashes))
+        while len(self.runs) > 1 and len(self.runs[-2]) <= len(self.runs[-1]):
+            merged = np.concatenate((self.runs.pop(), self.runs.pop()))
+            merged.sort()
+            self.runs.append(merged)
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre hashes de 64 bits (doble hashing), con el tamaño limitado a `max_bytes`."""
+
+    def __init__(self, n_items, max_bytes, fp_rate=0.001):
+        n_items = max(n_items, 1)
+        wanted_bits = int(-n_items * math.log(fp_rate) / math.log(2) ** 2)
+        self.m = max(64, min(wanted_bits, max_bytes * 8))
+        self.k = min(16, max(1, round(self.m / n_items * math.log(2))))
+        self.bits = np.zeros((self.m + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, hashes):
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        for i in range(self.k):
+            yield (h1 + np.uint64(i) * h2) % np.uint64(self.m)
+
+    def add(self, hashes):
+        for pos in self._positions(hashes):
+            np.bitwise_or.at(self.bits, pos >> np.uint64(3), np.left_shift(1, pos & np.uint64(7)).astype(np.uint8))
+
+    def contains(self, hashes):
+        found = np.ones(len(hashes), dtype=bool)
+        for pos in self._positions(hashes):
+            found &= ((self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1).astype(bool)
+        return found
+
+
+class ExistingIds:
+    """
+    IDs que ya estaban en la colección, en memoria acotada: un hilo recorre los IDs por páginas y
+    los mete en un filtro de Bloom de como mucho `max_bytes`. Las consultas no esperan al recorrido:
+    mientras no ha terminado, todos los IDs se comprueban contra Chroma; después solo los que el
+    filtro da como posibles (los falsos positivos se descartan con esa misma comprobación exacta).
+    """
+
+    def __init__(self, collection, max_bytes, page_size=5000):
+        self.collection = collection
+        self.page_size = page_size
+        self.total = collection.count()
+        self.bloom = BloomFilter(self.total, max_bytes)
+        self.scanned = 0
+        self.error = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.total:
+            self._done.set()
+            return self
+        self._thread = threading.Thread(target=self._scan, name="ids-existentes", daemon=True)
+        self._thread.start()
+        return self
+
+    def _scan(self):
+        try:
+            for ids in iter_collection_ids(self.collection, self.page_size):
+                self.bloom.add(id_hashes(ids))
+                self.scanned += len(ids)
+                # Lo que se añada durante la carga no forma parte de los IDs previos
+                if self.scanned >= self.total:
+                    break
+            self._done.set()
+        except Exception as e:
+            # Sin filtro completo se sigue comprobando todo contra Chroma
+            self.error = e
+            print(f"Advertencia: No se pudieron recorrer los IDs existentes de la colección: {e}")
+
+    def lookup(self, ids, hashes=None, include_metadata=False):
+        """Devuelve {ID: metadatos (o None)} de los `ids` que ya están en la colección."""
+        if not self.total or not ids:
+            return {}
+        candidates = list(ids)
+        if self._done.is_set():
+            hashes = id_hashes(ids) if hashes is None else hashes
+            candidates = [doc_id for doc_id, maybe in zip(ids, self.bloom.contains(hashes)) if maybe]
+            if not candidates:
+                return {}
+        result = self.collection.get(ids=candidates, include=["metadatas"] if include_metadata else [])
+        metadatas = result.get("metadatas") or [None] * len(result["ids"])
+        return dict(zip(result["ids"], metadatas))
+
+    def memory_bytes(self):
+        return self.bloom.bits.nbytes
@@ -0,0 +1,120 @@
+import chromadb
+import os
+import time
+import argparse
+from bm25_index import BM25Index, index_path, remove_index_files
+from id_dedup import ExistingIds
+from parquet_io import iter_parquet_batches, read_file_metadata
+
+CHROMA_DB_PATH = "./my_chroma_db"
+BATCH_SIZE = 5000
+# Valores de Chroma para los parámetros HNSW que no figuran en los metadatos de la colección
+HNSW_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Restaura en ChromaDB una exportación .parquet (export_data_from_chromadb.py) con sus embeddings, sin calcularlos de nuevo."
+    )
+    parser.add_argument('--input-file', type=str, required=True, help='Archivo .parquet exportado')
+    parser.add_argument('--collection', type=str, default=None, help='Colección de destino (default: la colección de origen del archivo)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Documentos por llamada a collection.add')
+    parser.add_argument('--dedup-max-mb', type=int, default=int(os.getenv("INGEST_DEDUP_MAX_MB", "256")), help='Memoria máxima en MB del filtro de IDs existentes de la colección')
+    args, unknown = parser.parse_known_args()
+    return args
+
+
+def main():
+    args = parse_args()
+
+    try:
+        info = read_file_metadata(args.input_file)
+    except Exception as e:
+        print(f"Error al leer '{args.input_file}': {e}")
+        exit()
+    collection_name = args.collection or info.get("collection")
+    if not collection_name:
+        print("[ERROR] El archivo no indica la colección de origen; usa --collection.")
+        exit()
+
+    try:
+        client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+        print("Cliente de ChromaDB (persistente) inicializado.")
+    except Exception as e:
+        print(f"Error al inicializar el cliente persistente: {e}")
+        exit()
+
+    # Sin función de embedding: los vectores vienen en el archivo (main.py usa la suya al consultar).
+    # Los metadatos del archivo (parámetros HNSW incluidos) solo se aplican al crear la colección:
+    # get_or_create_collection los escribiría sobre una existente sin cambiar su índice HNSW
+    origen = info.get("collection_metadata") or {}
+    existia = True
+    try:
+        try:
+            collection = client.get_collection(name=collection_name, embedding_function=None)
+        except Exception:
+            existia = False
+            collection = client.create_collection(name=collection_name, embedding_function=None, metadata=origen or None)
+        print(f"Colección '{collection_name}' {'obtenida' if existia else 'creada'} ({collection.count()} documentos).")
+    except Exception as e:
+        print(f"Error al obtener o crear la colección '{collection_name}': {e}")
+        exit()
+    if existia:
+        guardados = collection.metadata or {}
+        claves = set(HNSW_DEFAULTS) | {k for k in origen if k.startswith("hnsw:")}
+        vigentes = {k: guardados.get(k, HNSW_DEFAULTS.get(k)) for k in claves}
+        distintos = {k: origen.get(k, HNSW_DEFAULTS.get(k)) for k in claves}
+        distintos = {k: v for k, v in distintos.items() if v != vigentes[k]}
+        if "hnsw:space" in distintos:
+            # Las distancias no significarían lo mismo que en la colección de origen
+            print(f"[ERROR] La colección '{collection_name}' usa hnsw:space={vigentes['hnsw:space']!r} y el archivo "
+                  f"viene de una con {distintos['hnsw:space']!r}; usa --collection con una colección nueva.")
+            exit()
+        if distintos:
+            vigentes = {k: vigentes[k] for k in distintos}
+            print(f"Advertencia: La colección ya existía con otros parámetros HNSW {vigentes}; se ignoran los del archivo {distintos}.")
+
+    bm25_path = index_path(CHROMA_DB_PATH, collection_name)
+    try:
+        bm25_index = BM25Index.load_or_build(bm25_path, collection)
+    except Exception as e:
+        print(f"Advertencia: No se pudo abrir el índice BM25, se reconstruirá desde la colección: {e}")
+        remove_index_files(bm25_path)
+        bm25_index = BM25Index.build_from_collection(bm25_path, collection)
+    existentes = ExistingIds(collection, args.dedup_max_mb * 1024 ** 2).start()
+
+    print(f"\nImportando '{args.input_file}' (embeddings de dimensión {info['dim']}) en lotes de {args.batch_size}...")
+    importados = 0
+    omitidos = 0
+    inicio = time.perf_counter()
+    try:
+        for ids, documentos, metadatos, embeddings in iter_parquet_batches(args.input_file, args.batch_size):
+            ya_estan = existentes.lookup(ids)
+            if ya_estan:
+                nuevos = [i for i, doc_id in enumerate(ids) if doc_id not in ya_estan]
+                omitidos += len(ids) - len(nuevos)
+                ids = [ids[i] for i in nuevos]
+                documentos = [documentos[i] for i in nuevos]
+                metadatos = [metadatos[i] for i in nuevos]
+                embeddings = embeddings[nuevos]
+            if not ids:
+                continue
+            collection.add(ids=ids, documents=documentos, metadatas=[m or None for m in metadatos],
+                           embeddings=embeddings.tolist())
+            bm25_index.add(ids, [doc or "" for doc in documentos])
+            importados += len(ids)
+            print(f"  - {importados} documentos importados...")
+    except Exception as e:
+        print(f"Error al importar documentos: {e}")
+    duracion = time.perf_counter() - inicio
+
+    if importados:
+        print(f"Índice BM25 actualizado en '{bm25_path}' ({len(bm25_index)} documentos).")
+    print(f"\nResumen: {importados} documentos importados, {omitidos} omitidos por tener un ID ya existente.")
+    print(f"Total de documentos en la colección '{collection_name}' ahora: {collection.count()}")
+    if duracion > 0 and importados:
+        print(f"Velocidad de importación: {importados / duracion:.1f} docs/s.")
+
+
+if __name__ == "__main__":
+    main()
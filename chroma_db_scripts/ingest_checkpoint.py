@@ -0,0 +1,76 @@
+import os
+import json
+
+
+def default_checkpoint_path(db_path, collection_name):
+    return os.path.join(db_path, "checkpoints", f"{collection_name}.json")
+
+
+class Checkpoint:
+    """
+    Punto de control de una carga: tras cada lote escrito en Chroma se guarda (de forma atómica y
+    con fsync) el archivo .jsonl, el byte y la línea siguientes al último registro leído y el número
+    de lote. Como los archivos se leen en orden alfabético, con --resume basta con saltar los
+    archivos anteriores y hacer seek en el del checkpoint.
+    """
+
+    def __init__(self, path, collection_name, documents_folder):
+        self.path = path
+        self.state = {
+            "collection": collection_name,
+            "documents_dir": os.path.abspath(documents_folder),
+            "batch_seq": 0,
+            "documentos": 0,
+            "archivo": None,
+            "offset": 0,
+            "linea": 0
+        }
+        self.resumed = False
+
+    def load(self):
+        """Carga el checkpoint previo si es de la misma colección y carpeta. Devuelve True si se reanuda."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Advertencia: No se pudo leer el checkpoint '{self.path}', se carga desde el principio: {e}")
+            return False
+        if (state.get("collection"), state.get("documents_dir")) != (self.state["collection"], self.state["documents_dir"]):
+            print(f"Advertencia: El checkpoint '{self.path}' es de otra colección o carpeta; se carga desde el principio.")
+            return False
+        self.state.update(state)
+        self.resumed = True
+        return True
+
+    def start_position(self, nombre_archivo, ruta_archivo):
+        """(offset, línea) desde donde leer el archivo, o None si ya se procesó entero en la carga anterior."""
+        archivo = self.state["archivo"]
+        if not self.resumed or archivo is None or nombre_archivo > archivo:
+            return 0, 0
+        if nombre_archivo < archivo:
+            return None
+        if os.path.getsize(ruta_archivo) < self.state["offset"]:
+            print(f"  - [WARNING] '{nombre_archivo}' es más corto que en el checkpoint; se lee desde el principio.")
+            return 0, 0
+        return self.state["offset"], self.state["linea"]
+
+    def commit(self, cursor, n_docs):
+        """Registra un lote ya escrito; `cursor` = (archivo, offset, línea) tras su último registro."""
+        self.state["archivo"], self.state["offset"], self.state["linea"] = cursor
+        self.state["batch_seq"] += 1
+        self.state["documentos"] += n_docs
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Borra el checkpoint al terminar una carga completa."""
+        for path in (self.path, self.path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,218 @@
+import os
+import json
+import mmap
+import shutil
+import sqlite3
+import argparse
+import datetime
+import numpy as np
+
+# Formato (una carpeta por colección, todo de solo lectura):
+#   manifest.json                    número de vectores, dimensión, espacio de distancia, origen
+#   vectors.npy                      matriz float32 N x D contigua
+#   sq_norms.npy                     normas al cuadrado de cada fila (para l2 sin restar vectores)
+#   ids.bin / ids.offsets.npy        IDs en UTF-8 concatenados + offsets uint64 (N + 1)
+#   documents.bin / .offsets.npy     documentos en UTF-8
+#   metadatas.bin / .offsets.npy     metadatos en JSON
+# Todo se abre con mmap: varios workers de uvicorn comparten una única copia en la page cache.
+FIELDS = ("ids", "documents", "metadatas")
+
+
+def store_path(db_path, collection_name):
+    return os.path.join(db_path, "mmap", collection_name)
+
+
+def collection_seq_id(db_path, collection_id):
+    """
+    Última operación (seq_id) aplicada a una colección, según los segmentos de esa colección en la
+    tabla max_seq_id de chroma.sqlite3. A diferencia del mtime del fichero, que comparten todas las
+    colecciones de la base, solo cambia con escrituras en esta colección. None si no se puede leer.
+    """
+    path = os.path.join(db_path, "chroma.sqlite3")
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+        try:
+            rows = conn.execute(
+                "SELECT m.seq_id FROM max_seq_id m JOIN segments s ON s.id = m.segment_id WHERE s.collection = ?",
+                (str(collection_id),)
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    # chromadb 0.4 guarda el seq_id como 8 bytes big-endian; las versiones posteriores, como entero
+    seq_ids = [int.from_bytes(v, "big") if isinstance(v, bytes) else int(v) for (v,) in rows if v is not None]
+    return max(seq_ids) if seq_ids else None
+
+
+def collection_stamp(db_path, collection):
+    """Sello de versión de la colección: [número de documentos, último seq_id] (el mismo que usa main.py)."""
+    seq_id = collection_seq_id(db_path, collection.id)
+    if seq_id is None:
+        # Esquema de Chroma desconocido: el mtime de la base es conservador (cambia con cualquier colección)
+        try:
+            seq_id = os.path.getmtime(os.path.join(db_path, "chroma.sqlite3"))
+        except OSError:
+            pass
+    return [collection.count(), seq_id]
+
+
+class _BlobWriter:
+    """Escribe valores en un .bin concatenado y guarda sus offsets al cerrar."""
+
+    def __init__(self, base_path, total):
+        self.base_path = base_path
+        self.offsets = np.zeros(total + 1, dtype=np.uint64)
+        self.count = 0
+        self._file = open(base_path + ".bin", "wb")
+
+    def write(self, value):
+        self._file.write(value)
+        self.offsets[self.count + 1] = self.offsets[self.count] + len(value)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+        np.save(self.base_path + ".offsets.npy", self.offsets[:self.count + 1])
+
+
+def export_collection(collection, output_dir, page_size=5000, db_path=None):
+    """
+    Exporta vectores, IDs, documentos y metadatos de una colección al formato mapeable en memoria,
+    página a página y escribiendo directamente a disco. Con `db_path`, el manifiesto guarda el sello
+    de versión de la colección al empezar: main.py solo usa la exportación mientras coincida.
+    """
+    source_version = collection_stamp(db_path, collection) if db_path else None
+    total = source_version[0] if source_version else collection.count()
+    tmp_dir = output_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    matrix = None
+    writers = {field: _BlobWriter(os.path.join(tmp_dir, field), total) for field in FIELDS}
+    offset = 0
+    while offset < total:
+        # Nunca más de `total` filas aunque la colección crezca durante la exportación
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=min(page_size, total - offset), offset=offset)
+        n = min(len(page["ids"]), total - offset)
+        if not n:
+            break
+        embeddings = np.asarray(page["embeddings"][:n], dtype=np.float32)
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(os.path.join(tmp_dir, "vectors.npy"), mode="w+",
+                                               dtype=np.float32, shape=(total, embeddings.shape[1]))
+        matrix[offset:offset + n] = embeddings
+        for doc_id, doc, meta in zip(page["ids"][:n], page["documents"][:n], page["metadatas"][:n]):
+            writers["ids"].write(doc_id.encode("utf-8"))
+            writers["documents"].write((doc or "").encode("utf-8"))
+            writers["metadatas"].write(json.dumps(meta or {}, ensure_ascii=False).encode("utf-8"))
+        offset += n
+        print(f"  - Exportados {offset} de {total} vectores...")
+    for writer in writers.values():
+        writer.close()
+
+    if matrix is None:
+        matrix = np.zeros((0, 0), dtype=np.float32)
+        np.save(os.path.join(tmp_dir, "vectors.npy"), matrix)
+    else:
+        matrix.flush()
+    rows = matrix[:offset]
+    np.save(os.path.join(tmp_dir, "sq_norms.npy"), np.einsum("ij,ij->i", rows, rows).astype(np.float32))
+    manifest = {
+        "collection": collection.name,
+        "count": offset,
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "space": (collection.metadata or {}).get("hnsw:space", "l2"),
+        "exported_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        # Si se leyó menos de lo previsto (borrados durante la exportación) el sello ya no es fiable
+        "source_version": source_version if source_version and offset == total else None
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    # Reemplazo atómico de la carpeta: los workers que tengan la versión anterior mapeada siguen funcionando
+    if os.path.exists(output_dir):
+        old_dir = output_dir + ".old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(output_dir, old_dir)
+        os.replace(tmp_dir, output_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, output_dir)
+    return manifest
+
+
+class _BlobColumn:
+    def __init__(self, base_path):
+        self.offsets = np.load(base_path + ".offsets.npy", mmap_mode="r")
+        self._file = open(base_path + ".bin", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def get(self, i):
+        return self._mmap[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8")
+
+
+class MmapStore:
+    """
+    Backend de búsqueda de solo lectura sobre una exportación mapeada en memoria. La puntuación es
+    exacta (un producto matriz-vector sobre la matriz mapeada) y no se copia nada al heap del proceso.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        count = self.manifest["count"]
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")[:count]
+        self.sq_norms = np.load(os.path.join(path, "sq_norms.npy"), mmap_mode="r")[:count]
+        self.space = self.manifest.get("space", "l2")
+        self.columns = {field: _BlobColumn(os.path.join(path, field)) for field in FIELDS}
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    def distances(self, queries):
+        """Distancias (B x N) con las mismas definiciones que Chroma para cada espacio."""
+        dots = queries @ self.vectors.T
+        if self.space == "ip":
+            return 1.0 - dots
+        if self.space == "cosine":
+            norms = np.sqrt(self.sq_norms) * np.linalg.norm(queries, axis=1, keepdims=True)
+            return 1.0 - dots / np.where(norms == 0, 1.0, norms)
+        return self.sq_norms - 2.0 * dots + (queries * queries).sum(axis=1, keepdims=True)
+
+    def search(self, query_embeddings, n_results):
+        """Devuelve (filas, distancias) del top-k de cada consulta, ordenado por distancia."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if not len(self):
+            return [np.arange(0)] * len(queries), [np.zeros(0, dtype=np.float32)] * len(queries)
+        distances = self.distances(queries)
+        k = min(n_results, distances.shape[1])
+        rows, dists = [], []
+        for row in distances:
+            top = np.argpartition(row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+            top = top[np.argsort(row[top], kind="stable")]
+            rows.append(top)
+            dists.append(row[top])
+        return rows, dists
+
+    def get(self, field, i):
+        value = self.columns[field].get(i)
+        return json.loads(value) if field == "metadatas" else value
+
+
+if __name__ == "__main__":
+    import chromadb
+
+    parser = argparse.ArgumentParser(description="Exporta una colección de ChromaDB al formato mapeable en memoria que comparten los workers de main.py (SEARCH_BACKEND=mmap).")
+    parser.add_argument('--collection', type=str, required=True, help='Nombre de la colección a exportar')
+    parser.add_argument('--db-path', type=str, default=os.getenv("CHROMADB_PATH", "./my_chroma_db"), help='Ruta de la base de ChromaDB')
+    parser.add_argument('--output-dir', type=str, default=None, help='Carpeta de salida (default: <db-path>/mmap/<colección>)')
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.db_path)
+    collection = client.get_collection(args.collection)
+    output_dir = args.output_dir or store_path(args.db_path, args.collection)
+    print(f"Exportando la colección '{args.collection}' ({collection.count()} documentos) a '{output_dir}'...")
+    manifest = export_collection(collection, output_dir, db_path=args.db_path)
+    print(f"¡Exportación completada! {manifest['count']} vectores de dimensión {manifest['dim']} (espacio {manifest['space']}).")
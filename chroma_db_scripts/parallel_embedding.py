@@ -0,0 +1,96 @@
+import os
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+# Función de embedding de cada proceso del pool (se carga una vez en el inicializador)
+_worker_embedding_fn = None
+
+
+def _init_worker(backend, model_name, cores_per_worker, counter):
+    """Fija el proceso a su parte de los núcleos y carga el modelo con ese número de hilos."""
+    global _worker_embedding_fn
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    if hasattr(os, "sched_setaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+        share = available[index * cores_per_worker:(index + 1) * cores_per_worker]
+        if share:
+            os.sched_setaffinity(0, share)
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(cores_per_worker)
+    if backend == "sentence-transformers":
+        import torch
+        torch.set_num_threads(cores_per_worker)
+    from embedding_backends import get_embedding_function
+    _worker_embedding_fn = get_embedding_function(backend, model_name, threads=cores_per_worker)
+
+
+def _encode(texts):
+    import numpy as np
+    return np.asarray(_worker_embedding_fn(texts), dtype=np.float32)
+
+
+class _BatchResult:
+    """Reúne los trozos de un lote (calculados en varios procesos) en el orden original."""
+
+    def __init__(self, size, chunks):
+        self.size = size
+        self.chunks = chunks  # [(índices, future)]
+
+    def done(self):
+        return all(future.done() for _, future in self.chunks)
+
+    def result(self):
+        embeddings = [None] * self.size
+        for indices, future in self.chunks:
+            for i, emb in zip(indices, future.result()):
+                embeddings[i] = emb.tolist()
+        return embeddings
+
+
+class ParallelEmbedder:
+    """
+    Calcula embeddings fuera de Chroma con un pool de procesos, cada uno fijado a
+    cores // workers núcleos. Cada lote se ordena por longitud y se parte en trozos de
+    `chunk_size` textos parecidos (poco padding) que se reparten entre los procesos.
+    Con workers=1 se calcula en el propio proceso con `embedding_fn`.
+    """
+
+    def __init__(self, backend, model_name, workers=1, chunk_size=64, embedding_fn=None):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.embedding_fn = embedding_fn
+        self._executor = None
+        if workers > 1:
+            available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+            self.cores_per_worker = max(1, available // workers)
+            # spawn: los procesos no heredan el estado de torch ni los hilos del loader
+            context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=context, initializer=_init_worker,
+                initargs=(backend, model_name, self.cores_per_worker, context.Value("i", 0))
+            )
+
+    def submit(self, texts):
+        """Devuelve un objeto con done()/result(); result() da una lista de embeddings en el orden de `texts`."""
+        if self._executor is None:
+            future = Future()
+            future.set_result(self.embedding_fn(texts))
+            return future
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        chunks = []
+        for start in range(0, len(order), self.chunk_size):
+            indices = order[start:start + self.chunk_size]
+            chunks.append((indices, self._executor.submit(_encode, [texts[i] for i in indices])))
+        return _BatchResult(len(texts), chunks)
+
+    def warm_up(self):
+        """Espera a que todos los procesos hayan cargado el modelo (para no medirlo como throughput)."""
+        if self._executor is not None:
+            for future in [self._executor.submit(_encode, ["warm-up"]) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
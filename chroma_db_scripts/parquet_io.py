@@ -0,0 +1,123 @@
+import json
+import numpy as np
+
+# Formato columnar para backup/restauración/copias entre máquinas sin recalcular embeddings:
+# id, document, una columna por clave de metadatos ("meta.<clave>") y embedding como lista
+# float32 de ancho fijo. Cada página exportada es un row group.
+FORMAT_VERSION = "chroma-parquet-v1"
+META_PREFIX = "meta."
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("El formato parquet necesita pyarrow (pip install pyarrow).")
+    return pa, pq
+
+
+def metadata_types(paginas):
+    """
+    Tipo de cada clave de metadatos en toda la colección: bool, int, float, str o json. Con tipos
+    mezclados (también int y float) la columna es json, que conserva el tipo de cada valor (5 y 5.0).
+    """
+    tipos = {}
+    for data in paginas:
+        for metadata in data.get('metadatas') or []:
+            for k, v in (metadata or {}).items():
+                tipo = type(v).__name__ if isinstance(v, (bool, int, float, str)) else "json"
+                previo = tipos.setdefault(k, tipo)
+                if previo != tipo:
+                    tipos[k] = "json"
+    return tipos
+
+
+def build_schema(tipos, dim, file_metadata):
+    pa, _ = _pyarrow()
+    arrow_types = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64(), "str": pa.string(), "json": pa.string()}
+    fields = [pa.field("id", pa.string(), nullable=False), pa.field("document", pa.string())]
+    for k, tipo in sorted(tipos.items()):
+        fields.append(pa.field(META_PREFIX + k, arrow_types[tipo], metadata={"chroma_type": tipo}))
+    fields.append(pa.field("embedding", pa.list_(pa.float32(), dim)))
+    metadata = {"format": FORMAT_VERSION, "dim": str(dim)}
+    metadata.update({k: json.dumps(v, ensure_ascii=False) for k, v in file_metadata.items()})
+    return pa.schema(fields, metadata=metadata)
+
+
+def page_to_batch(data, schema, dim):
+    pa, _ = _pyarrow()
+    metadatas = [m or {} for m in (data.get('metadatas') or [None] * len(data['ids']))]
+    columns = [pa.array(data['ids'], pa.string()), pa.array(data.get('documents') or [None] * len(data['ids']), pa.string())]
+    for field in schema:
+        if not field.name.startswith(META_PREFIX):
+            continue
+        k = field.name[len(META_PREFIX):]
+        if field.metadata[b"chroma_type"] == b"json":
+            values = [json.dumps(m[k], ensure_ascii=False) if k in m else None for m in metadatas]
+        else:
+            values = [m.get(k) for m in metadatas]
+        columns.append(pa.array(values, field.type))
+    embeddings = np.asarray(data['embeddings'], dtype=np.float32).reshape(len(data['ids']), dim)
+    columns.append(pa.FixedSizeListArray.from_arrays(pa.array(embeddings.reshape(-1)), dim))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def write_parquet(paginas, output_file, tipos, file_metadata, compression="zstd"):
+    """
+    Escribe las páginas (con ids, documents, metadatas y embeddings) en `output_file`, una página
+    por row group, sin tener más de una página en memoria. Devuelve los documentos escritos.
+    Sin páginas (colección vacía) escribe un archivo válido sin filas, con dimensión 0.
+    """
+    _, pq = _pyarrow()
+    writer = None
+    schema = None
+    dim = None
+    escritos = 0
+    try:
+        for data in paginas:
+            if writer is None:
+                dim = len(data['embeddings'][0])
+                schema = build_schema(tipos, dim, file_metadata)
+                writer = pq.ParquetWriter(output_file, schema, compression=compression)
+            writer.write_batch(page_to_batch(data, schema, dim))
+            escritos += len(data['ids'])
+        if writer is None:
+            writer = pq.ParquetWriter(output_file, build_schema(tipos, 0, file_metadata), compression=compression)
+    finally:
+        if writer is not None:
+            writer.close()
+    return escritos
+
+
+def read_file_metadata(input_file):
+    """Metadatos guardados en el archivo (colección de origen, metadatos de la colección, dim; 0 si estaba vacía)."""
+    _, pq = _pyarrow()
+    metadata = {k.decode(): v.decode() for k, v in (pq.read_schema(input_file).metadata or {}).items()}
+    if metadata.get("format") != FORMAT_VERSION:
+        raise ValueError(f"'{input_file}' no es una exportación {FORMAT_VERSION}.")
+    info = {"dim": int(metadata.pop("dim"))}
+    metadata.pop("format")
+    info.update({k: json.loads(v) for k, v in metadata.items() if not k.startswith("ARROW:")})
+    return info
+
+
+def iter_parquet_batches(input_file, batch_size):
+    """Lee el archivo en lotes: (ids, documentos, metadatos, embeddings como array float32 (n, dim))."""
+    _, pq = _pyarrow()
+    parquet_file = pq.ParquetFile(input_file)
+    schema = parquet_file.schema_arrow
+    meta_fields = [(f.name, f.name[len(META_PREFIX):], f.metadata[b"chroma_type"] == b"json")
+                   for f in schema if f.name.startswith(META_PREFIX)]
+    dim = schema.field("embedding").type.list_size
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        ids = batch.column("id").to_pylist()
+        documentos = batch.column("document").to_pylist()
+        metadatos = [{} for _ in ids]
+        for name, k, is_json in meta_fields:
+            for meta, v in zip(metadatos, batch.column(name).to_pylist()):
+                # Chroma no admite None: una clave ausente en el documento original queda nula
+                if v is not None:
+                    meta[k] = json.loads(v) if is_json else v
+        embeddings = batch.column("embedding").flatten().to_numpy(zero_copy_only=False).reshape(-1, dim)
+        yield ids, documentos, metadatos, embeddings
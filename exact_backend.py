@@ -0,0 +1,94 @@
+import threading
+import numpy as np
+
+
+def top_k(distances, k):
+    """Filas (B x k) con las k menores distancias de cada consulta, ordenadas, con selección parcial."""
+    n = distances.shape[1]
+    k = min(k, n)
+    if k < n:
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(n), distances.shape).copy()
+    order = np.argsort(np.take_along_axis(distances, top, axis=1), axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    return top, np.take_along_axis(distances, top, axis=1)
+
+
+class ExactIndex:
+    """
+    Búsqueda exacta por fuerza bruta: todos los embeddings de la colección en una matriz float32
+    contigua en memoria y un único GEMM por lote de consultas. Para colecciones pequeñas (decenas
+    de miles de fragmentos) suele ser más rápido que el HNSW y no pierde recall.
+    Se construye de forma diferida paginando la colección y se invalida igual que MetadataIndex.
+    No sustituye al HNSW en memoria: collection.get(include=["embeddings"]) carga el segmento HNSW,
+    así que la matriz es una segunda copia de los vectores en cada worker.
+    """
+
+    def __init__(self, collection, page_size=5000):
+        self.collection = collection
+        self.page_size = page_size
+        self.space = (collection.metadata or {}).get("hnsw:space", "l2")
+        self._data = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+
+    def build(self):
+        total = self.collection.count()
+        ids = []
+        matrix = None
+        offset = 0
+        while offset < total:
+            # Nunca más de `total` filas: si la colección crece durante la lectura, lo nuevo entra en el próximo build
+            page = self.collection.get(include=["embeddings"], limit=min(self.page_size, total - offset), offset=offset)
+            n = min(len(page["ids"]), total - offset)
+            if not n:
+                break
+            embeddings = np.asarray(page["embeddings"][:n], dtype=np.float32)
+            if matrix is None:
+                matrix = np.empty((total, embeddings.shape[1]), dtype=np.float32)
+            matrix[offset:offset + n] = embeddings
+            ids.extend(page["ids"][:n])
+            offset += n
+        matrix = matrix[:offset] if matrix is not None else np.zeros((0, 0), dtype=np.float32)
+        sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+        if self.space == "cosine":
+            # Filas normalizadas: la distancia coseno queda en un solo producto
+            matrix = matrix / np.where(sq_norms == 0, 1.0, np.sqrt(sq_norms))[:, None]
+        return {"ids": ids, "matrix": np.ascontiguousarray(matrix), "sq_norms": sq_norms}
+
+    def _get_data(self):
+        with self._lock:
+            if self._data is None:
+                self._data = self.build()
+            return self._data
+
+    def __len__(self):
+        return len(self._get_data()["ids"])
+
+    def search(self, query_embeddings, n_results):
+        """
+        Devuelve {"ids", "distances"} (formato de collection.query) con las mismas definiciones
+        de distancia que Chroma para cada espacio hnsw.
+        """
+        data = self._get_data()
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if not data["ids"]:
+            return {"ids": [[] for _ in queries], "distances": [[] for _ in queries]}
+        dots = queries @ data["matrix"].T
+        if self.space == "cosine":
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            distances = 1.0 - dots / np.where(norms == 0, 1.0, norms)
+        elif self.space == "ip":
+            distances = 1.0 - dots
+        else:
+            distances = data["sq_norms"] - 2.0 * dots + np.einsum("ij,ij->i", queries, queries)[:, None]
+        rows, dists = top_k(distances, n_results)
+        ids = data["ids"]
+        return {
+            "ids": [[ids[i] for i in row] for row in rows],
+            "distances": [[float(d) for d in row] for row in dists]
+        }
@@ -1,30 +1,1013 @@
 import os
-from fastapi import FastAPI
+import json
+import threading
+import time
+import contextvars
+import fnmatch
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import chromadb
 
-app = FastAPI()
+from chroma_db_scripts.bm25_index import BM25Index, identifier_token, index_path, reciprocal_rank_fusion
+from chroma_db_scripts.mmap_store import MmapStore, collection_stamp, store_path
+from exact_backend import ExactIndex
+from metadata_index import DEFAULT_INDEXED_FIELDS, MetadataIndex, exact_search
+from metrics import (Counter, Gauge, LabeledHistogram, process_rss_bytes,
+                     render_metric, render_value)
+from micro_batching import EmbeddingBatcher
+from reranker import CrossEncoderReranker
 
-# Obtén la ruta de la base de datos desde variable de entorno o usa un valor por defecto
+# Campos que se devuelven por defecto junto a los IDs (ver `include` en QueryRequest)
+DEFAULT_INCLUDE = ("documents", "metadatas", "distances")
+
+# Obtén la ruta de la base de datos y la colección desde variables de entorno o usa valores por defecto
 CHROMADB_PATH = os.getenv("CHROMADB_PATH", "./my_chroma_db")
+CHROMADB_COLLECTION = os.getenv("CHROMADB_COLLECTION", "onboarding_profile_full_20250617_183236")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Backend de embeddings: sentence-transformers (PyTorch fp32), onnx u onnx-int8 (ver EMBEDDING_ONNX_DIR)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+
+# Tamaños de las caches LRU (0 desactiva la cache correspondiente)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+# Cada cuántos segundos se comprueba si la colección cambió (count() + último seq_id escrito en ella)
+CACHE_VERSION_TTL = float(os.getenv("CACHE_VERSION_TTL", "5"))
+# Máximo de consultas aceptadas en una sola llamada a /search/batch
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "256"))
+# Micro-batching de embeddings entre peticiones concurrentes (ventana 0 lo desactiva)
+MICROBATCH_WAIT_MS = float(os.getenv("MICROBATCH_WAIT_MS", "2"))
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+# Campos indexados en memoria para filtros `where` y tamaño máximo del conjunto candidato
+# para el que se usa la búsqueda exacta en lugar del HNSW
+INDEXED_FIELDS = [f.strip() for f in os.getenv("INDEXED_FIELDS", ",".join(DEFAULT_INDEXED_FIELDS)).split(",") if f.strip()]
+PREFILTER_MAX_CANDIDATES = int(os.getenv("PREFILTER_MAX_CANDIDATES", "5000"))
+# Búsqueda híbrida: cuántos candidatos (x n_results) aporta cada recuperador antes de fusionar con RRF
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR", "4"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "8"))
+# Búsqueda federada: máximo de colecciones (tras expandir los patrones glob) por petición
+FEDERATED_MAX_COLLECTIONS = int(os.getenv("FEDERATED_MAX_COLLECTIONS", "32"))
+# group_by=document: sobre-muestreo inicial (x n_results) y tope de candidatos al ampliar la búsqueda
+GROUP_OVERFETCH_FACTOR = int(os.getenv("GROUP_OVERFETCH_FACTOR", "3"))
+GROUP_MAX_CANDIDATES = int(os.getenv("GROUP_MAX_CANDIDATES", "500"))
+# Re-ranking con cross-encoder: tamaño del conjunto candidato, tope, lote y presupuesto de latencia
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_MAX_CANDIDATES = int(os.getenv("RERANK_MAX_CANDIDATES", "200"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+# Backend de las búsquedas vectoriales sin filtros: "hnsw" (Chroma, por defecto), "exact" (fuerza bruta
+# con numpy sobre una matriz en memoria), "auto" (exact hasta EXACT_SEARCH_MAX_DOCS documentos, hnsw por
+# encima) o "mmap" (exportación mapeada en memoria compartida entre workers, ver chroma_db_scripts/mmap_store.py).
+# "exact" y "auto" no ahorran el HNSW: leer los embeddings con collection.get() ya lo carga en memoria,
+# así que cada worker guarda el HNSW más una copia float32 de todos los vectores
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "hnsw")
+EXACT_SEARCH_MAX_DOCS = int(os.getenv("EXACT_SEARCH_MAX_DOCS", "50000"))
+MMAP_STORE_PATH = os.getenv("MMAP_STORE_PATH")
+# Límites del `ef` (tamaño de la lista de candidatos del HNSW) que una petición puede pedir en /search
+HNSW_EF_MIN = int(os.getenv("HNSW_EF_MIN", "10"))
+HNSW_EF_MAX = int(os.getenv("HNSW_EF_MAX", "500"))
+# Arranque: precargar también el cross-encoder y segundos que una petición espera al warm-up
+WARMUP_RERANKER = os.getenv("WARMUP_RERANKER", "true").lower() in ("1", "true", "yes")
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "60"))
+# Reintentos del warm-up fallido (p. ej. timeout al descargar el modelo), con espera exponencial;
+# agotados, /healthz responde 503 para que el orquestador reinicie el pod
+WARMUP_MAX_ATTEMPTS = int(os.getenv("WARMUP_MAX_ATTEMPTS", "5"))
+WARMUP_RETRY_BASE = float(os.getenv("WARMUP_RETRY_BASE", "2"))
+WARMUP_RETRY_MAX = float(os.getenv("WARMUP_RETRY_MAX", "60"))
+
+# Se inicializan en warm_up(): nada pesado (torch, modelo, índice HNSW) se carga al importar
+embedding_function = None
+chroma_client = None
+collection = None
+metadata_index = None
+exact_index = None
+mmap_store = None
+_mmap_stale_warned = threading.Event()
+_mmap_lock = threading.Lock()
+_mmap_state = {"manifest_mtime": None, "checked_at": 0.0}
+
+
+class LRUCache:
+    """Cache LRU acotada y segura entre hilos, con contadores de aciertos y fallos."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+embedding_cache = LRUCache(EMBEDDING_CACHE_SIZE)
+result_cache = LRUCache(RESULT_CACHE_SIZE)
+rerank_cache = LRUCache(RERANK_CACHE_SIZE)
+
+reranker = CrossEncoderReranker(RERANK_MODEL, batch_size=RERANK_BATCH_SIZE,
+                                budget_ms=RERANK_BUDGET_MS, cache=rerank_cache)
+
+# Un único hilo ejecuta el modelo: los hilos de uvicorn dejan de competir por los hilos intra-op de torch
+embedding_batcher = EmbeddingBatcher(
+    lambda texts: embedding_function(texts),
+    max_batch_size=MICROBATCH_MAX_SIZE,
+    max_wait_ms=MICROBATCH_WAIT_MS
+) if MICROBATCH_WAIT_MS > 0 else None
+
+# Pool para lanzar en paralelo los recuperadores de una misma petición
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+
+_ready = threading.Event()
+_warmup_lock = threading.Lock()
+_warmup_state = {"thread": None, "error": None, "timings": {}, "attempts": 0, "fatal": False}
+
+
+def warm_up():
+    """
+    Fase de arranque explícita: abre la base, carga el modelo de embeddings (aquí se importa torch
+    o ONNX Runtime, según EMBEDDING_BACKEND),
+    abre la colección y lanza una consulta de prueba para dejar el índice HNSW en memoria.
+    Registra el tiempo de cada fase.
+    """
+    global embedding_function, chroma_client, collection, metadata_index, exact_index
+    timings = _warmup_state["timings"]
+    total_start = time.perf_counter()
+
+    def phase(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        timings[name] = round(time.perf_counter() - start, 4)
+        print(f"[STARTUP] {name}: {timings[name]:.3f} s")
+        return result
+
+    try:
+        chroma_client = phase("chroma_client", lambda: chromadb.PersistentClient(path=CHROMADB_PATH))
+
+        def load_embedding_function():
+            # Misma función de embedding que usa add_data_to_chromadb.py, así podemos calcular
+            # (y cachear) el embedding de la consulta nosotros mismos
+            from chroma_db_scripts.embedding_backends import get_embedding_function
+            return get_embedding_function(EMBEDDING_BACKEND, EMBEDDING_MODEL)
+
+        embedding_function = phase("embedding_model", load_embedding_function)
+        collection = phase("collection", lambda: chroma_client.get_collection(
+            CHROMADB_COLLECTION, embedding_function=embedding_function))
+        metadata_index = MetadataIndex(collection, INDEXED_FIELDS)
+        if SEARCH_BACKEND in ("auto", "exact"):
+            exact_index = ExactIndex(collection)
+        dummy = phase("model_warmup", lambda: embedding_function(["warm-up"])[0])
+        if INDEXED_FIELDS:
+            phase("metadata_index_build", metadata_index.load)
+        use_mmap = SEARCH_BACKEND == "mmap" and os.path.exists(mmap_manifest_path())
+        if SEARCH_BACKEND == "mmap" and not use_mmap:
+            print(f"[STARTUP] ⚠️ No existe la exportación mmap en '{os.path.dirname(mmap_manifest_path())}'; se usará el índice HNSW de Chroma hasta que se exporte.")
+        if use_mmap:
+            # Con mmap no se toca el HNSW: cada worker solo mapea la exportación compartida
+            store = phase("mmap_open", lambda: refresh_mmap_store(force=True))
+            phase("mmap_warmup", lambda: store.search([[float(x) for x in dummy]], 1))
+        elif exact_index is not None and (SEARCH_BACKEND == "exact" or collection.count() <= EXACT_SEARCH_MAX_DOCS):
+            # Leer los embeddings carga también el HNSW del segmento (lo usan las consultas con filtros no
+            # selectivos): en memoria quedan el HNSW y la matriz de ExactIndex
+            phase("exact_index_build", lambda: len(exact_index))
+            phase("exact_warmup", lambda: exact_index.search([[float(x) for x in dummy]], 1))
+        elif collection.count() > 0:
+            phase("index_warmup", lambda: collection.query(query_embeddings=[[float(x) for x in dummy]], n_results=1))
+        if WARMUP_RERANKER:
+            phase("reranker_warmup", reranker.warm_up)
+        timings["total"] = round(time.perf_counter() - total_start, 4)
+        print(f"[STARTUP] Servicio listo en {timings['total']:.3f} s (colección '{CHROMADB_COLLECTION}', {collection.count()} documentos)")
+        _warmup_state["error"] = None
+        _ready.set()
+    except Exception as e:
+        _warmup_state["error"] = f"{type(e).__name__}: {e}"
+        print(f"[STARTUP] Error durante el warm-up: {_warmup_state['error']}")
+
+
+def run_warm_up():
+    """Lanza warm_up() hasta WARMUP_MAX_ATTEMPTS veces, esperando WARMUP_RETRY_BASE * 2^n segundos entre intentos."""
+    while True:
+        _warmup_state["attempts"] += 1
+        warm_up()
+        if _ready.is_set():
+            return
+        if _warmup_state["attempts"] >= WARMUP_MAX_ATTEMPTS:
+            _warmup_state["fatal"] = True
+            print(f"[STARTUP] Warm-up fallido tras {_warmup_state['attempts']} intentos; /healthz pasa a 503.")
+            return
+        delay = min(WARMUP_RETRY_MAX, WARMUP_RETRY_BASE * 2 ** (_warmup_state["attempts"] - 1))
+        print(f"[STARTUP] Reintentando el warm-up en {delay:.1f} s (intento {_warmup_state['attempts'] + 1}/{WARMUP_MAX_ATTEMPTS})...")
+        time.sleep(delay)
+
+
+def start_warm_up():
+    with _warmup_lock:
+        if _warmup_state["thread"] is None:
+            _warmup_state["thread"] = threading.Thread(target=run_warm_up, name="warm-up", daemon=True)
+            _warmup_state["thread"].start()
+
+
+def ensure_ready():
+    """Espera a que termine el warm-up (lo lanza si nadie lo hizo); 503 si falla o no llega a tiempo."""
+    if _ready.is_set():
+        return
+    start_warm_up()
+    _warmup_state["thread"].join(READY_TIMEOUT)
+    if not _ready.is_set():
+        raise HTTPException(status_code=503, detail=_warmup_state["error"] or "El servicio aún se está iniciando")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # El warm-up corre en segundo plano para que /healthz responda desde el primer momento
+    start_warm_up()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+# --- Métricas (expuestas en /metrics en formato Prometheus) ---
+stage_histogram = LabeledHistogram(("stage",))
+request_histogram = LabeledHistogram(("path",))
+requests_total = Counter(("path", "status"))
+requests_in_flight = Gauge()
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage(name):
+    """Mide una etapa de la búsqueda: la acumula en el histograma y, si se pidió, en la petición actual."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_histogram.observe(elapsed, (name,))
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def submit_with_context(fn, *args):
+    # Los hilos del pool no heredan el contexto: se copia para que las etapas cuenten en la petición
+    return search_executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    requests_in_flight.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        requests_in_flight.dec()
+        route = request.scope.get("route")
+        path = route.path if route is not None else "other"
+        request_histogram.observe(time.perf_counter() - start, (path,))
+        requests_total.inc((path, str(status)))
+
+_version_lock = threading.Lock()
+_version_state = {"stamp": None, "checked_at": 0.0, "invalidations": 0}
+
+
+def collection_version():
+    """
+    Devuelve un sello de versión de la colección: (número de documentos, último seq_id escrito en
+    ella; ver collection_stamp), que no cambia con escrituras en otras colecciones de la base.
+    Solo se recalcula cada CACHE_VERSION_TTL segundos; si cambió, se vacía la cache de resultados.
+    """
+    now = time.monotonic()
+    with _version_lock:
+        if _version_state["stamp"] is not None and now - _version_state["checked_at"] < CACHE_VERSION_TTL:
+            return _version_state["stamp"]
+        stamp = tuple(collection_stamp(CHROMADB_PATH, collection))
+        if _version_state["stamp"] is not None and stamp != _version_state["stamp"]:
+            result_cache.clear()
+            metadata_index.invalidate()
+            if exact_index is not None:
+                exact_index.invalidate()
+            _version_state["invalidations"] += 1
+        _version_state["stamp"] = stamp
+        _version_state["checked_at"] = now
+        return stamp
+
+
+def embed_queries(queries):
+    """Embeddings de las consultas, calculando en una sola llamada al modelo solo las que no están en cache."""
+    embeddings = [embedding_cache.get(q) for q in queries]
+    missing = [i for i, emb in enumerate(embeddings) if emb is None]
+    if missing:
+        texts = [queries[i] for i in missing]
+        with stage("embedding"):
+            computed = embedding_batcher.encode(texts) if embedding_batcher else embedding_function(texts)
+        for i, emb in zip(missing, computed):
+            emb = [float(x) for x in emb]
+            embedding_cache.put(queries[i], emb)
+            embeddings[i] = emb
+    return embeddings
+
+
+def ann_query(query_embeddings, n_results, where=None, where_document=None, include=DEFAULT_INCLUDE, target=None,
+              ef=None):
+    """
+    collection.query en dos pasos medidos por separado: búsqueda HNSW (solo IDs y distancias) y
+    lectura desde SQLite de los documentos y/o metadatos pedidos en `include` (ninguna si no hace falta).
+    `target` permite consultar otra colección distinta de la principal. Sin filtros, la colección
+    principal se puntúa con el backend exacto o mmap si SEARCH_BACKEND lo selecciona.
+    `ef` amplía la búsqueda HNSW: hnswlib explora max(ef, k) candidatos, así que pedir k = ef y
+    recortar a n_results equivale a fijar ese ef solo para esta consulta.
+    """
+    target = target or collection
+    if target is collection and not where and not where_document:
+        store = current_mmap_store()
+        if store is not None:
+            return mmap_query(store, query_embeddings, n_results, include)
+        if use_exact_backend():
+            with stage("exact_scan"):
+                results = exact_index.search(query_embeddings, n_results)
+            return fetch_fields(target, results, include)
+    with stage("ann"):
+        results = target.query(
+            query_embeddings=query_embeddings,
+            n_results=max(n_results, ef or 0),
+            where=where or None,
+            where_document=where_document or None,
+            include=["distances"]
+        )
+    if ef and ef > n_results:
+        results = {"ids": [row[:n_results] for row in results["ids"]],
+                   "distances": [row[:n_results] for row in results["distances"]]}
+    return fetch_fields(target, results, include)
+
+
+def fetch_fields(target, results, include=DEFAULT_INCLUDE):
+    """Completa un resultado con solo IDs y distancias con los documentos y/o metadatos de `include`."""
+    fields = [f for f in ("documents", "metadatas") if f in include]
+    if not fields:
+        return results
+    with stage("metadata_fetch"):
+        ids = list({doc_id for row in results["ids"] for doc_id in row})
+        rows = {}
+        if ids:
+            data = target.get(ids=ids, include=fields)
+            for field in fields:
+                rows[field] = dict(zip(data["ids"], data[field]))
+    for field in fields:
+        results[field] = [[rows.get(field, {}).get(doc_id) for doc_id in row] for row in results["ids"]]
+    return results
+
+
+def use_exact_backend():
+    """En modo auto, la búsqueda exacta solo se usa mientras la colección no supere EXACT_SEARCH_MAX_DOCS."""
+    if exact_index is None:
+        return False
+    return SEARCH_BACKEND == "exact" or collection_version()[0] <= EXACT_SEARCH_MAX_DOCS
+
+
+def mmap_manifest_path():
+    return os.path.join(MMAP_STORE_PATH or store_path(CHROMADB_PATH, CHROMADB_COLLECTION), "manifest.json")
+
+
+def refresh_mmap_store(force=False):
+    """
+    Devuelve la exportación mmap abierta, reabriéndola si su manifest.json cambió (la exportación
+    reemplaza el directorio entero). El manifiesto solo se mira cada CACHE_VERSION_TTL segundos.
+    Las consultas en curso siguen con el store anterior: sus archivos quedan mapeados aunque se borren.
+    """
+    global mmap_store
+    now = time.monotonic()
+    with _mmap_lock:
+        if not force and now - _mmap_state["checked_at"] < CACHE_VERSION_TTL:
+            return mmap_store
+        _mmap_state["checked_at"] = now
+        manifest_path = mmap_manifest_path()
+        try:
+            mtime = os.path.getmtime(manifest_path)
+        except OSError:
+            mtime = None
+        if mtime is None or mtime == _mmap_state["manifest_mtime"]:
+            return mmap_store
+        try:
+            store = MmapStore(os.path.dirname(manifest_path))
+        except Exception as e:
+            if force:
+                raise
+            # Se reintenta en la siguiente comprobación (p. ej. si la exportación se estaba reemplazando)
+            print(f"[SEARCH] ⚠️ No se pudo abrir la exportación mmap: {type(e).__name__}: {e}")
+            return mmap_store
+        if mmap_store is not None:
+            print(f"[SEARCH] Exportación mmap reabierta ({len(store)} vectores, exportada el {store.manifest.get('exported_at')}).")
+        mmap_store = store
+        _mmap_state["manifest_mtime"] = mtime
+        _mmap_stale_warned.clear()
+        return store
+
+
+def current_mmap_store():
+    """
+    Exportación mmap vigente, o None si no hay o no corresponde a la colección. El manifiesto guarda el
+    sello de collection_version() del momento de exportar, así que cualquier escritura posterior en
+    la colección (altas, upserts, borrados) la deja desfasada hasta re-exportarla; las escrituras en
+    otras colecciones de la base no. Las exportaciones sin sello solo se comparan por número de documentos.
+    """
+    if SEARCH_BACKEND != "mmap":
+        return None
+    store = refresh_mmap_store()
+    if store is None:
+        return None
+    stamp = collection_version()
+    exported = store.manifest.get("source_version")
+    if (list(stamp) == exported) if exported else (stamp[0] == len(store)):
+        return store
+    if not _mmap_stale_warned.is_set():
+        _mmap_stale_warned.set()
+        print(f"[SEARCH] ⚠️ La exportación mmap (exportada el {store.manifest.get('exported_at')}, {len(store)} vectores) "
+              f"no corresponde a la versión actual de la colección; se usa HNSW hasta re-exportarla.")
+    return None
+
+
+def mmap_query(store, query_embeddings, n_results, include=DEFAULT_INCLUDE):
+    with stage("mmap_scan"):
+        rows, distances = store.search(query_embeddings, n_results)
+    fields = [f for f in ("documents", "metadatas") if f in include]
+    results = {
+        "ids": [[store.get("ids", i) for i in row] for row in rows],
+        "distances": [[float(d) for d in dist] for dist in distances]
+    }
+    if fields:
+        with stage("metadata_fetch"):
+            for field in fields:
+                results[field] = [[store.get(field, i) for i in row] for row in rows]
+    return results
+
+
+def filtered_query(query_embedding, n_results, where=None, where_document=None, include=DEFAULT_INCLUDE, ef=None):
+    """
+    Consulta con filtros. Si el índice de metadatos reduce `where` a pocos candidatos, se puntúan
+    de forma exacta (siempre devuelve n_results si hay suficientes); si no, se delega en Chroma.
+    """
+    candidates = metadata_index.candidates(where) if where else None
+    if candidates is not None and len(candidates) <= PREFILTER_MAX_CANDIDATES:
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        with stage("exact_scoring"):
+            results = exact_search(collection, query_embedding, candidates, n_results,
+                                   where=where, where_document=where_document, space=space)
+        return fetch_fields(collection, results, include)
+    return ann_query([query_embedding], n_results, where=where, where_document=where_document, include=include, ef=ef)
+
+
+_bm25_lock = threading.Lock()
+_bm25_state = {"index": None, "version": None, "file_id": None}
+
+
+def bm25_file_id(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+
+def get_bm25_index():
+    """
+    Índice BM25 de la colección (SQLite en disco que mantienen add_data_to_chromadb.py e
+    import_data_to_chromadb.py): cada consulta lee lo último confirmado, sin recargar nada.
+    Cuando cambia collection_version() se comprueba que el fichero sigue siendo el mismo: si se
+    reemplazó se vuelve a abrir y, si ya no existe, se construye desde los documentos de la colección.
+    """
+    version = collection_version()
+    with _bm25_lock:
+        if _bm25_state["index"] is not None and version == _bm25_state["version"]:
+            return _bm25_state["index"]
+        path = index_path(CHROMADB_PATH, collection.name)
+        file_id = bm25_file_id(path)
+        if _bm25_state["index"] is None or file_id is None or file_id != _bm25_state["file_id"]:
+            _bm25_state["index"] = BM25Index.load_or_build(path, collection)
+            file_id = bm25_file_id(path)
+        _bm25_state["version"] = version
+        _bm25_state["file_id"] = file_id
+        return _bm25_state["index"]
+
+
+def lexical_search(query, n_results, where=None):
+    candidates = metadata_index.candidates(where) if where else None
+    index = get_bm25_index()
+    with stage("lexical"):
+        # Un identificador (clave de Jira, código de error) va primero como token exacto; si no
+        # aparece entero en ningún documento se puntúa con sus partes como cualquier consulta
+        token = identifier_token(query)
+        if token:
+            hits = index.lookup(token, n_results, candidates=candidates)
+            if hits:
+                return hits
+        return index.search(query, n_results, candidates=candidates)
+
+
+def vector_query(query, n_results, where=None, where_document=None, include=DEFAULT_INCLUDE, ef=None):
+    embedding = embed_queries([query])[0]
+    if where or where_document:
+        return filtered_query(embedding, n_results, where=where, where_document=where_document, include=include, ef=ef)
+    return ann_query([embedding], n_results, include=include, ef=ef)
+
+
+def hybrid_query(query, n_results, where=None, where_document=None, lexical_only=False, include=DEFAULT_INCLUDE,
+                 ef=None):
+    """
+    Ejecuta a la vez la búsqueda vectorial y la léxica (BM25) y fusiona ambos rankings con RRF.
+    Devuelve el formato de collection.query más `scores` (puntuación RRF); los aciertos solo
+    léxicos tienen distancia None.
+    """
+    pool = n_results * HYBRID_CANDIDATE_FACTOR
+    lexical_future = submit_with_context(lexical_search, query, pool, where)
+    fields = [f for f in ("documents", "metadatas") if f in include]
+    vector = {"ids": [[]], "distances": [[]], **{f: [[]] for f in fields}}
+    if not lexical_only:
+        vector = vector_query(query, pool, where=where, where_document=where_document, include=include, ef=ef)
+    lexical = lexical_future.result()
+
+    rows = {}
+    for j, doc_id in enumerate(vector["ids"][0]):
+        rows[doc_id] = {"distances": vector["distances"][0][j], **{f: vector[f][0][j] for f in fields}}
+    fused = reciprocal_rank_fusion([vector["ids"][0], [doc_id for doc_id, _ in lexical]], k=RRF_K)
+    # Los aciertos solo léxicos se completan desde Chroma, que además aplica los filtros
+    missing = [doc_id for doc_id, _ in fused[:pool] if doc_id not in rows]
+    if missing:
+        with stage("metadata_fetch"):
+            extra = collection.get(ids=missing, where=where or None, where_document=where_document or None,
+                                   include=fields)
+        for j, doc_id in enumerate(extra["ids"]):
+            rows[doc_id] = {"distances": None, **{f: extra[f][j] for f in fields}}
+
+    results = {"ids": [[]], "distances": [[]], "scores": [[]], **{f: [[]] for f in fields}}
+    for doc_id, score in fused:
+        if doc_id not in rows:
+            continue
+        results["ids"][0].append(doc_id)
+        for key, value in rows[doc_id].items():
+            results[key][0].append(value)
+        results["scores"][0].append(score)
+        if len(results["ids"][0]) == n_results:
+            break
+    return results
+
+
+_collections_lock = threading.Lock()
+_collections_state = {"handles": {}, "names": [], "listed_at": 0.0}
+
+
+def list_collection_names():
+    now = time.monotonic()
+    with _collections_lock:
+        if now - _collections_state["listed_at"] >= CACHE_VERSION_TTL:
+            # Según la versión de Chroma, list_collections devuelve objetos o nombres
+            _collections_state["names"] = sorted(getattr(c, "name", c) for c in chroma_client.list_collections())
+            _collections_state["listed_at"] = now
+        return _collections_state["names"]
+
+
+def get_collection_by_name(name):
+    if name == collection.name:
+        return collection
+    with _collections_lock:
+        if name not in _collections_state["handles"]:
+            _collections_state["handles"][name] = chroma_client.get_collection(name, embedding_function=embedding_function)
+        return _collections_state["handles"][name]
+
+
+def forget_collection(name):
+    """Descarta el handle cacheado de una colección (p. ej. borrada o recreada) para que se vuelva a abrir."""
+    with _collections_lock:
+        _collections_state["handles"].pop(name, None)
+
+
+def resolve_collections(patterns):
+    """Expande nombres y patrones glob (p. ej. "org_knowledge_2025*") a nombres de colecciones existentes."""
+    names = []
+    for pattern in patterns:
+        if any(ch in pattern for ch in "*?["):
+            matches = fnmatch.filter(list_collection_names(), pattern)
+        else:
+            matches = [pattern]
+        for name in matches:
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def base_document_id(doc_id):
+    return doc_id.split("::fragment", 1)[0]
+
+
+def fetch_distinct_documents(retrieve, n_documents, n_candidates):
+    """
+    Llama a `retrieve(pool)` duplicando el pool hasta reunir n_documents documentos base distintos,
+    agotar los resultados o llegar a GROUP_MAX_CANDIDATES.
+    """
+    pool = min(max(n_candidates, n_documents * GROUP_OVERFETCH_FACTOR), GROUP_MAX_CANDIDATES)
+    while True:
+        results = retrieve(pool)
+        ids = results["ids"][0]
+        if (len({base_document_id(doc_id) for doc_id in ids}) >= n_documents or len(ids) < pool
+                or pool >= GROUP_MAX_CANDIDATES):
+            return results
+        pool = min(pool * 2, GROUP_MAX_CANDIDATES)
+
+
+def group_by_document(results, n_documents, per_document=1):
+    """
+    Agrupa los fragmentos de un resultado (una sola consulta) por documento base: conserva los
+    n_documents mejores documentos, con hasta per_document fragmentos cada uno, contiguos y en el
+    orden del ranking. Añade `document_ids` con el documento base de cada acierto.
+    """
+    groups = {}
+    for j, doc_id in enumerate(results["ids"][0]):
+        base_id = base_document_id(doc_id)
+        if base_id not in groups:
+            if len(groups) == n_documents:
+                continue
+            groups[base_id] = []
+        if len(groups[base_id]) < per_document:
+            groups[base_id].append(j)
+    order = [j for positions in groups.values() for j in positions]
+    grouped = {key: [[values[0][j] for j in order]] for key, values in results.items()
+               if isinstance(values, list) and values and isinstance(values[0], list)}
+    grouped["document_ids"] = [[base_document_id(doc_id) for doc_id in grouped["ids"][0]]]
+    if "reranked" in results:
+        grouped["reranked"] = results["reranked"]
+    return grouped
+
+
+def federated_query(query, names, n_results, where=None, where_document=None, include=DEFAULT_INCLUDE, ef=None):
+    """
+    Consulta varias colecciones en paralelo con el mismo embedding y fusiona por distancia en un
+    único top-k, quedándose con el mejor acierto de cada documento base (las ejecuciones del pipeline
+    repiten los mismos documentos en colecciones con distinto timestamp). Como esa deduplicación
+    descarta aciertos, cada colección se consulta con un pool que se duplica (igual que en
+    fetch_distinct_documents) hasta reunir n_results documentos distintos, agotar todas las
+    colecciones o llegar a GROUP_MAX_CANDIDATES. Una colección que falla se deja fuera de la fusión
+    y se devuelve en `failed_collections`; solo si fallan todas la petición falla (503).
+    """
+    embedding = embed_queries([query])[0]
+    try:
+        targets = {name: get_collection_by_name(name) for name in names}
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"Colección no encontrada: {e}")
+
+    def query_collection(name, pool):
+        try:
+            return ann_query([embedding], pool, where, where_document, include, targets[name], ef)
+        except Exception:
+            # Un handle que falla no se reutiliza: la siguiente petición abre la colección de nuevo
+            forget_collection(name)
+            raise
+
+    pool = min(max(n_results, n_results * GROUP_OVERFETCH_FACTOR), GROUP_MAX_CANDIDATES)
+    partials = {}
+    failed = {}
+    pending = list(names)
+    while True:
+        futures = [(name, submit_with_context(query_collection, name, pool)) for name in pending]
+        for name, future in futures:
+            try:
+                partials[name] = future.result()
+            except Exception as e:
+                print(f"[FEDERATED] ⚠️ La colección '{name}' falló y se omite: {e}")
+                failed[name] = str(e)
+                partials.pop(name, None)
+        if not partials:
+            raise HTTPException(status_code=503, detail=f"Ninguna colección respondió: {failed}")
+        hits = []
+        for name, partial in partials.items():
+            for j, doc_id in enumerate(partial["ids"][0]):
+                hits.append((partial["distances"][0][j], name, j, partial))
+        hits.sort(key=lambda hit: hit[0])
+        # Solo se vuelven a consultar las colecciones que llenaron el pool (las demás ya dieron todo)
+        pending = [name for name in partials if len(partials[name]["ids"][0]) >= pool]
+        distinct = len({base_document_id(partial["ids"][0][j]) for _, _, j, partial in hits})
+        if distinct >= n_results or not pending or pool >= GROUP_MAX_CANDIDATES:
+            break
+        pool = min(pool * 2, GROUP_MAX_CANDIDATES)
+
+    fields = [f for f in ("documents", "metadatas") if f in include]
+    results = {"ids": [[]], "distances": [[]], "collections": [[]], **{f: [[]] for f in fields}}
+    seen = set()
+    for distance, name, j, partial in hits:
+        doc_id = partial["ids"][0][j]
+        base_id = base_document_id(doc_id)
+        if base_id in seen:
+            continue
+        seen.add(base_id)
+        results["ids"][0].append(doc_id)
+        results["distances"][0].append(distance)
+        results["collections"][0].append(name)
+        for field in fields:
+            results[field][0].append(partial[field][0][j])
+        if len(results["ids"][0]) == n_results:
+            break
+    results["failed_collections"] = [name for name in names if name in failed]
+    return results
+
+
+def cache_key_for(query, n_results, **options):
+    options = {k: v for k, v in options.items() if v is not None}
+    return (query, n_results, collection.name, collection_version(), json.dumps(options, sort_keys=True))
+
+
+def format_result(results, i, include=DEFAULT_INCLUDE):
+    response = {"ids": results["ids"][i]}
+    for field in DEFAULT_INCLUDE:
+        if field in include:
+            response[field] = results[field][i]
+    for key in ("scores", "rerank_scores", "collections", "document_ids"):
+        if key in results:
+            response[key] = results[key][i]
+    for key in ("reranked", "failed_collections"):
+        if key in results:
+            response[key] = results[key]
+    return response
 
-# Usa PersistentClient con la ruta especificada
-chroma_client = chromadb.PersistentClient(path=CHROMADB_PATH)
-collection = chroma_client.get_collection("onboarding_profile_full_20250617_183236")  # Cambia por el nombre de tu colección
 
 class QueryRequest(BaseModel):
     query: str
     n_results: int = 5
+    where: Optional[Dict[str, Any]] = None
+    where_document: Optional[Dict[str, Any]] = None
+    # "vector" (por defecto), "lexical" (solo BM25) o "hybrid" (vector + BM25 fusionados con RRF)
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+    # Re-ordena un conjunto candidato más amplio con el cross-encoder antes de recortar a n_results
+    rerank: Optional[bool] = None
+    # Devuelve en `timings` el desglose de latencia por etapa (ms) de esta petición
+    debug_timings: Optional[bool] = None
+    # Campos a devolver junto a los IDs (por defecto todos); p. ej. ["distances"] o ["metadatas"]
+    include: Optional[List[Literal["documents", "metadatas", "distances"]]] = None
+    # Respuesta NDJSON en streaming: una línea por acierto según se serializa
+    stream: Optional[bool] = None
+    # Búsqueda federada: nombres o patrones glob de colecciones a consultar en paralelo
+    collections: Optional[List[str]] = None
+    # ef del HNSW solo para esta petición (entre HNSW_EF_MIN y HNSW_EF_MAX); más alto = más recall y más latencia
+    ef: Optional[int] = None
+    # "document": n_results pasa a contar documentos distintos (no fragmentos), con hasta
+    # fragments_per_document fragmentos de cada uno
+    group_by: Optional[Literal["document"]] = None
+    fragments_per_document: int = 1
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    n_results: int = 5
+    include: Optional[List[Literal["documents", "metadatas", "distances"]]] = None
+
+# Las sondas son async: se responden en el event loop aunque el threadpool esté lleno de /search
+@app.get("/healthz")
+async def healthz():
+    # Un warm-up que agotó sus reintentos no se recupera solo: que el orquestador reinicie el proceso
+    if _warmup_state["fatal"]:
+        return JSONResponse(status_code=503, content={"status": "error", "error": _warmup_state["error"]})
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    if _ready.is_set():
+        return {"status": "ready", "collection": CHROMADB_COLLECTION, "startup_timings": _warmup_state["timings"]}
+    status = "error" if _warmup_state["fatal"] else "retrying" if _warmup_state["error"] else "starting"
+    return JSONResponse(status_code=503, content={
+        "status": status,
+        "error": _warmup_state["error"],
+        "attempts": _warmup_state["attempts"],
+        "startup_timings": _warmup_state["timings"]
+    })
+
+def json_response(content):
+    with stage("serialize"):
+        body = json.dumps(content, ensure_ascii=False, default=float)
+    return Response(content=body, media_type="application/json")
+
+
+def ndjson_response(response, timings=None):
+    """
+    Devuelve los aciertos como NDJSON: una línea por acierto, serializada al enviarla. Las colecciones
+    que fallaron en una búsqueda federada van en una línea final, como el desglose de tiempos.
+    """
+    fields = [key for key, value in response.items() if isinstance(value, list) and key != "failed_collections"]
+    singular = {"ids": "id", "documents": "document", "metadatas": "metadata", "distances": "distance",
+                "scores": "score", "rerank_scores": "rerank_score", "collections": "collection",
+                "document_ids": "document_id"}
+
+    def lines():
+        for i in range(len(response["ids"])):
+            hit = {singular.get(key, key): response[key][i] for key in fields}
+            yield json.dumps(hit, ensure_ascii=False, default=float) + "\n"
+        if response.get("failed_collections"):
+            yield json.dumps({"failed_collections": response["failed_collections"]}, ensure_ascii=False) + "\n"
+        if timings is not None:
+            yield json.dumps({"timings": {name: round(value * 1000, 3) for name, value in timings.items()}}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def with_timings(response, timings):
+    # La serialización no puede incluirse en su propio desglose: se ve solo en /metrics
+    return {**response, "timings": {name: round(value * 1000, 3) for name, value in timings.items()}}
+
 
 @app.post("/search")
 def search(request: QueryRequest):
-    results = collection.query(
-        query_texts=[request.query],
-        n_results=request.n_results
-    )
+    ensure_ready()
+    timings = {}
+    _request_timings.set(timings)
+    response = run_search(request)
+    if request.stream:
+        return ndjson_response(response, timings if request.debug_timings else None)
+    if request.debug_timings:
+        response = with_timings(response, timings)
+    return json_response(response)
+
+
+def run_search(request):
+    mode = request.mode if request.mode != "vector" else None
+    rerank = request.rerank or None
+    include = tuple(f for f in DEFAULT_INCLUDE if request.include is None or f in request.include)
+    if request.ef is not None and not HNSW_EF_MIN <= request.ef <= HNSW_EF_MAX:
+        raise HTTPException(status_code=400, detail=f"ef debe estar entre {HNSW_EF_MIN} y {HNSW_EF_MAX}")
+    grouped = request.group_by == "document"
+    if grouped and request.fragments_per_document < 1:
+        raise HTTPException(status_code=400, detail="fragments_per_document debe ser al menos 1")
+    if request.collections:
+        if grouped:
+            raise HTTPException(status_code=400, detail="La búsqueda en varias colecciones ya devuelve un acierto por documento; no admite group_by")
+        return run_federated_search(request, include)
+    with stage("cache_lookup"):
+        cache_key = cache_key_for(request.query, request.n_results, where=request.where,
+                                  where_document=request.where_document, mode=mode, rerank=rerank, ef=request.ef,
+                                  include=list(include) if include != DEFAULT_INCLUDE else None,
+                                  group_by=request.group_by,
+                                  fragments_per_document=request.fragments_per_document if grouped else None)
+        cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    n_candidates = request.n_results
+    # El cross-encoder necesita el texto aunque el cliente no pida los documentos
+    fetch = include + ("documents",) if rerank and "documents" not in include else include
+    if rerank:
+        n_candidates = min(max(RERANK_CANDIDATES, request.n_results), RERANK_MAX_CANDIDATES)
+
+    def retrieve(n):
+        if mode in ("hybrid", "lexical"):
+            return hybrid_query(request.query, n, where=request.where,
+                                where_document=request.where_document, lexical_only=mode == "lexical",
+                                include=fetch, ef=request.ef)
+        return vector_query(request.query, n, where=request.where,
+                            where_document=request.where_document, include=fetch, ef=request.ef)
+
+    if grouped:
+        results = fetch_distinct_documents(retrieve, request.n_results, n_candidates)
+    else:
+        results = retrieve(n_candidates)
+    if rerank:
+        with stage("rerank"):
+            # Al agrupar se reordena todo el conjunto y el recorte lo hace group_by_document
+            keep = len(results["ids"][0]) if grouped else request.n_results
+            results = reranker.rerank(request.query, results, keep)
+    if grouped:
+        results = group_by_document(results, request.n_results, request.fragments_per_document)
+    response = format_result(results, 0, include)
+    # Un re-ranking cortado por el presupuesto de latencia no se cachea
+    if response.get("reranked", True):
+        result_cache.put(cache_key, response)
+    return response
+
+def run_federated_search(request, include):
+    # Sin cache de resultados: cada colección tiene su propia versión
+    if request.mode not in (None, "vector"):
+        raise HTTPException(status_code=400, detail="La búsqueda en varias colecciones solo admite mode=vector")
+    names = resolve_collections(request.collections)
+    if not names:
+        raise HTTPException(status_code=404, detail="Ningún nombre de colección coincide con la petición")
+    if len(names) > FEDERATED_MAX_COLLECTIONS:
+        raise HTTPException(status_code=400, detail=f"Máximo {FEDERATED_MAX_COLLECTIONS} colecciones por petición")
+    fetch = include + ("documents",) if request.rerank and "documents" not in include else include
+    n_candidates = request.n_results
+    if request.rerank:
+        n_candidates = min(max(RERANK_CANDIDATES, request.n_results), RERANK_MAX_CANDIDATES)
+    results = federated_query(request.query, names, n_candidates, where=request.where,
+                              where_document=request.where_document, include=fetch, ef=request.ef)
+    if request.rerank:
+        with stage("rerank"):
+            results = {**reranker.rerank(request.query, results, request.n_results),
+                       "failed_collections": results["failed_collections"]}
+    return format_result(results, 0, include)
+
+@app.post("/search/batch")
+def search_batch(request: BatchQueryRequest):
+    ensure_ready()
+    # Resuelve desde la cache lo que se pueda y lanza una única consulta vectorizada
+    # (un solo forward del modelo y una sola búsqueda ANN) para el resto
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_QUERIES} consultas por lote")
+    include = tuple(f for f in DEFAULT_INCLUDE if request.include is None or f in request.include)
+    include_key = list(include) if include != DEFAULT_INCLUDE else None
+    responses = [None] * len(request.queries)
+    pending = {}
+    for i, query in enumerate(request.queries):
+        cached = result_cache.get(cache_key_for(query, request.n_results, include=include_key))
+        if cached is not None:
+            responses[i] = cached
+        else:
+            pending.setdefault(query, []).append(i)
+    if pending:
+        queries = list(pending)
+        results = ann_query(embed_queries(queries), request.n_results, include=include)
+        for j, query in enumerate(queries):
+            response = format_result(results, j, include)
+            result_cache.put(cache_key_for(query, request.n_results, include=include_key), response)
+            for i in pending[query]:
+                responses[i] = response
+    return json_response({"results": responses})
+
+@app.get("/cache/stats")
+def cache_stats():
     return {
-        "ids": results["ids"][0],
-        "documents": results["documents"][0],
-        "metadatas": results["metadatas"][0],
-        "distances": results["distances"][0]
-    }
\ No newline at end of file
+        "embedding_cache": embedding_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "rerank_cache": rerank_cache.stats(),
+        "collection_version": list(collection_version()) if _ready.is_set() else None,
+        "invalidations": _version_state["invalidations"]
+    }
+
+@app.get("/batcher/stats")
+def batcher_stats():
+    if embedding_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **embedding_batcher.stats()}
+
+@app.get("/metrics")
+def metrics():
+    parts = [
+        render_metric("search_requests_total", "counter", "Peticiones HTTP por ruta y código de estado", requests_total),
+        render_metric("search_requests_in_flight", "gauge", "Peticiones HTTP en curso", requests_in_flight),
+        render_metric("search_request_duration_seconds", "histogram", "Latencia total de cada petición HTTP", request_histogram),
+        render_metric("search_stage_duration_seconds", "histogram", "Latencia por etapa de la búsqueda", stage_histogram),
+    ]
+    cache_entries = Gauge(("cache",))
+    cache_hits = Counter(("cache",))
+    cache_misses = Counter(("cache",))
+    for name, cache in (("embedding", embedding_cache), ("result", result_cache), ("rerank", rerank_cache)):
+        stats = cache.stats()
+        cache_entries.set(stats["size"], (name,))
+        cache_hits.inc((name,), stats["hits"])
+        cache_misses.inc((name,), stats["misses"])
+    parts += [
+        render_metric("search_cache_entries", "gauge", "Entradas en cada cache LRU", cache_entries),
+        render_metric("search_cache_hits_total", "counter", "Aciertos de cada cache LRU", cache_hits),
+        render_metric("search_cache_misses_total", "counter", "Fallos de cada cache LRU", cache_misses),
+        render_value("search_cache_invalidations_total", "counter", "Vaciados de la cache de resultados por cambios en la colección", _version_state["invalidations"]),
+    ]
+    if embedding_batcher is not None:
+        parts += [
+            render_metric("search_embedding_batch_size", "histogram", "Consultas codificadas por forward del modelo", embedding_batcher.batch_size_histogram),
+            render_metric("search_embedding_queue_wait_seconds", "histogram", "Espera en cola antes de codificar", embedding_batcher.queue_wait_histogram),
+        ]
+    parts += [
+        render_value("process_resident_memory_bytes", "gauge", "Memoria residente del proceso", process_rss_bytes()),
+        render_value("search_ready", "gauge", "1 si el warm-up terminó correctamente", int(_ready.is_set())),
+    ]
+    return Response(content="\n".join(parts) + "\n", media_type="text/plain; version=0.0.4")
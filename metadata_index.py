@@ -0,0 +1,138 @@
+import threading
+import numpy as np
+
+# Campos de metadatos que guardan los loaders y que merece la pena indexar
+DEFAULT_INDEXED_FIELDS = ("space_key", "type", "status", "project", "labels", "hierarchy")
+
+
+class MetadataIndex:
+    """
+    Índice en memoria campo -> valor -> conjunto de IDs, construido paginando los metadatos
+    de la colección. Sirve para resolver filtros `where` selectivos sin recorrer el HNSW.
+    """
+
+    def __init__(self, collection, fields=DEFAULT_INDEXED_FIELDS, page_size=5000):
+        self.collection = collection
+        self.fields = tuple(fields)
+        self.page_size = page_size
+        self._index = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def build(self):
+        index = {field: {} for field in self.fields}
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=self.page_size, offset=offset)
+            ids = page["ids"]
+            if not ids:
+                break
+            for doc_id, meta in zip(ids, page["metadatas"]):
+                if not meta:
+                    continue
+                for field in self.fields:
+                    value = meta.get(field)
+                    if value is not None:
+                        index[field].setdefault(value, set()).add(doc_id)
+            offset += len(ids)
+        return index
+
+    def _get_index(self):
+        with self._lock:
+            if self._index is None:
+                self._index = self.build()
+            return self._index
+
+    def load(self):
+        """Construye el índice si aún no lo está (warm_up lo llama para no hacerlo en la primera consulta filtrada)."""
+        return sum(len(values) for values in self._get_index().values())
+
+    def candidates(self, where):
+        """
+        Devuelve un superconjunto de los IDs que cumplen `where`, o None si el filtro no se puede
+        resolver con el índice (campo no indexado, $ne, $nin, comparaciones numéricas...).
+        """
+        if not where:
+            return None
+        return self._resolve(where, self._get_index())
+
+    def _resolve(self, where, index):
+        clauses = []
+        for key, value in where.items():
+            if key == "$and":
+                clauses.append(("and", value))
+            elif key == "$or":
+                clauses.append(("or", value))
+            else:
+                clauses.append(("field", (key, value)))
+        result = None
+        for kind, value in clauses:
+            if kind == "and":
+                # En un AND podemos ignorar las partes no resolubles: el resultado sigue siendo un superconjunto
+                resolved = [r for r in (self._resolve(w, index) for w in value) if r is not None]
+                part = set.intersection(*resolved) if resolved else None
+            elif kind == "or":
+                part = set()
+                for w in value:
+                    sub = self._resolve(w, index)
+                    if sub is None:
+                        return None
+                    part |= sub
+            else:
+                part = self._resolve_field(index, *value)
+            if part is None:
+                continue
+            result = part if result is None else result & part
+        return result
+
+    def _resolve_field(self, index, field, condition):
+        if field not in index:
+            return None
+        values = index[field]
+        if isinstance(condition, dict):
+            if len(condition) != 1:
+                return None
+            op, operand = next(iter(condition.items()))
+            if op == "$eq":
+                return set(values.get(operand, ()))
+            if op == "$in":
+                result = set()
+                for v in operand:
+                    result |= values.get(v, set())
+                return result
+            return None
+        return set(values.get(condition, ()))
+
+
+def exact_search(collection, query_embedding, ids, n_results, where=None, where_document=None, space="l2"):
+    """
+    Búsqueda exacta sobre un conjunto pequeño de candidatos: trae solo sus embeddings y los puntúa
+    con numpy. Devuelve {"ids", "distances"} como collection.query con una sola consulta; los
+    documentos y metadatos de los n_results ganadores se piden después (fetch_fields en main.py).
+    """
+    data = collection.get(
+        ids=list(ids),
+        where=where or None,
+        where_document=where_document or None,
+        include=["embeddings"]
+    )
+    if not len(data["ids"]):
+        return {"ids": [[]], "distances": [[]]}
+    matrix = np.asarray(data["embeddings"], dtype=np.float32)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    # Mismas definiciones de distancia que usa Chroma para cada espacio hnsw
+    if space == "cosine":
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        distances = 1.0 - (matrix @ query) / np.where(norms == 0, 1.0, norms)
+    elif space == "ip":
+        distances = 1.0 - matrix @ query
+    else:
+        diff = matrix - query
+        distances = np.einsum("ij,ij->i", diff, diff)
+    k = min(n_results, len(distances))
+    top = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+    top = top[np.argsort(distances[top], kind="stable")]
+    return {"ids": [[data["ids"][i] for i in top]], "distances": [[float(distances[i]) for i in top]]}
@@ -0,0 +1,136 @@
+import threading
+
+# Buckets por defecto (en segundos) para latencias
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos, seguro entre hilos (mismo modelo que Prometheus)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+
+    def snapshot(self):
+        """Devuelve los conteos acumulados por bucket (le), el total y la suma."""
+        with self._lock:
+            cumulative = {}
+            running = 0
+            for bound, count in zip(self.buckets, self._counts):
+                running += count
+                cumulative[str(bound)] = running
+            cumulative["+Inf"] = self._count
+            return {"buckets": cumulative, "count": self._count, "sum": self._sum}
+
+
+class Counter:
+    """Contador monotónico con etiquetas opcionales (tupla de valores en el orden de `labelnames`)."""
+
+    def __init__(self, labelnames=()):
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class Gauge(Counter):
+    """Valor que sube y baja (peticiones en curso, tamaño de cache...)."""
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def set(self, value, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+
+class LabeledHistogram:
+    """Un Histogram por combinación de etiquetas."""
+
+    def __init__(self, labelnames, buckets=LATENCY_BUCKETS):
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        with self._lock:
+            if values not in self._histograms:
+                self._histograms[values] = Histogram(self.buckets)
+            return self._histograms[values]
+
+    def observe(self, value, labels=()):
+        self.labels(*labels).observe(value)
+
+    def items(self):
+        with self._lock:
+            return list(self._histograms.items())
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_metric(name, kind, help_text, metric):
+    """Serializa un Counter, Gauge, Histogram o LabeledHistogram en formato de texto de Prometheus."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    if isinstance(metric, Histogram):
+        histograms = [((), (), metric)]
+    elif isinstance(metric, LabeledHistogram):
+        histograms = [(metric.labelnames, values, h) for values, h in metric.items()]
+    else:
+        for values, value in metric.samples():
+            lines.append(f"{name}{_format_labels(metric.labelnames, values)} {value}")
+        return "\n".join(lines)
+    for labelnames, values, histogram in histograms:
+        snapshot = histogram.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, ('le', bound))} {count}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {snapshot['sum']}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {snapshot['count']}")
+    return "\n".join(lines)
+
+
+def render_value(name, kind, help_text, value):
+    """Serializa un valor suelto (p. ej. leído de una cache o del proceso) como métrica sin etiquetas."""
+    return f"# HELP {name} {help_text}\n# TYPE {name} {kind}\n{name} {value}"
+
+
+def process_rss_bytes():
+    """Memoria residente del proceso (VmRSS en Linux; pico de RSS como aproximación en otros sistemas)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    import sys
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
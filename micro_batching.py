@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import Histogram, LATENCY_BUCKETS
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class _Pending:
+    __slots__ = ("texts", "future", "enqueued_at")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class EmbeddingBatcher:
+    """
+    Agrupa las consultas que llegan desde distintos hilos dentro de una ventana de tiempo
+    (max_wait_ms, con tope max_batch_size) y las codifica en un único forward del modelo.
+    Cada hilo espera su Future y recibe solo sus embeddings.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=64, max_wait_ms=2.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_histogram = Histogram(LATENCY_BUCKETS)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, texts):
+        self._ensure_started()
+        pending = _Pending(list(texts))
+        self._queue.put(pending)
+        return pending.future
+
+    def encode(self, texts):
+        return self.submit(texts).result()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._queue.qsize(),
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_seconds": self.queue_wait_histogram.snapshot()
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            texts = []
+            for item in batch:
+                self.queue_wait_histogram.observe(started - item.enqueued_at)
+                texts.extend(item.texts)
+            self.batch_size_histogram.observe(len(texts))
+            try:
+                embeddings = self.encode_fn(texts)
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+            offset = 0
+            for item in batch:
+                item.future.set_result(embeddings[offset:offset + len(item.texts)])
+                offset += len(item.texts)
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+import time
+
+
+class CrossEncoderReranker:
+    """
+    Re-ranking con un cross-encoder pequeño en CPU. Puntúa los pares (consulta, documento) por
+    lotes en el orden vectorial y no lanza un lote que no quepa en el presupuesto de latencia (según
+    el coste medio por par de los lotes anteriores): los candidatos puntuados se reordenan y los que
+    no dio tiempo a puntuar conservan el orden vectorial detrás.
+    """
+
+    def __init__(self, model_name, batch_size=16, budget_ms=150.0, cache=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget = budget_ms / 1000.0
+        self.cache = cache
+        self._model = None
+        self._lock = threading.Lock()
+        # Segundos por par (media móvil exponencial), medidos siempre con el modelo ya cargado
+        self._pair_seconds = None
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                # Import diferido: torch solo se carga si alguien pide re-ranking
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name)
+            return self._model
+
+    def _predict(self, model, pairs):
+        start = time.monotonic()
+        values = model.predict(pairs, batch_size=len(pairs))
+        per_pair = (time.monotonic() - start) / len(pairs)
+        self._pair_seconds = per_pair if self._pair_seconds is None else 0.8 * self._pair_seconds + 0.2 * per_pair
+        return values
+
+    def warm_up(self):
+        """Carga el modelo y mide el coste por par con un lote completo (el primero paga la inicialización)."""
+        model = self._get_model()
+        pairs = [("warm-up", "warm-up")] * self.batch_size
+        model.predict(pairs, batch_size=len(pairs))
+        self._pair_seconds = None
+        self._predict(model, pairs)
+        return self._pair_seconds
+
+    def _pair_key(self, query, document):
+        return hashlib.sha1(f"{self.model_name}\0{query}\0{document}".encode("utf-8")).hexdigest()
+
+    def score(self, query, documents, budget=None):
+        """Devuelve una puntuación por documento (None si no dio tiempo a calcularla)."""
+        budget = self.budget if budget is None else budget
+        scores = [None] * len(documents)
+        keys = [self._pair_key(query, doc or "") for doc in documents]
+        pending = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                scores[i] = cached
+            else:
+                pending.append(i)
+        if not pending:
+            return scores
+        model = self._get_model()
+        # El presupuesto empieza con el modelo cargado: una carga en frío no se come el de la petición
+        deadline = time.monotonic() + budget
+        start = 0
+        while start < len(pending):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            size = self.batch_size
+            if self._pair_seconds:
+                size = min(size, int(remaining / self._pair_seconds))
+                if size < 1:
+                    if start:
+                        break
+                    # Al menos un par por llamada: si no, una estimación inflada no se corregiría nunca
+                    size = 1
+            batch = pending[start:start + size]
+            start += len(batch)
+            batch_scores = self._predict(model, [(query, documents[i] or "") for i in batch])
+            for i, value in zip(batch, batch_scores):
+                scores[i] = float(value)
+                if self.cache is not None:
+                    self.cache.put(keys[i], scores[i])
+        return scores
+
+    def rerank(self, query, results, n_results, budget=None):
+        """
+        Reordena un resultado con formato collection.query (una sola consulta) y lo recorta a
+        n_results. Añade `rerank_scores` y `reranked` (False si se agotó el presupuesto).
+        """
+        documents = results["documents"][0]
+        scores = self.score(query, documents, budget=budget)
+        scored = [i for i, s in enumerate(scores) if s is not None]
+        unscored = [i for i, s in enumerate(scores) if s is None]
+        scored.sort(key=lambda i: scores[i], reverse=True)
+        order = (scored + unscored)[:n_results]
+        reranked = {key: [[values[0][i] for i in order]] for key, values in results.items()
+                    if isinstance(values, list) and values and isinstance(values[0], list)}
+        reranked["rerank_scores"] = [[scores[i] for i in order]]
+        reranked["reranked"] = not unscored
+        return reranked
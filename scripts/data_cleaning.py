@@ -1,16 +1,27 @@
 import re
 import json
 import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from tqdm import tqdm
 import os
 
 FRAGMENT_LENGTH = 2000  # Fragmenta automáticamente si el contenido limpio supera este valor
+CHUNK_LINES = 256  # Líneas que limpia cada tarea del pool de procesos
+
+# Compiladas al importar el módulo: una vez por proceso del pool
+ATLASSIAN_EMOJI_RE = re.compile(r":(info|check_mark|cross_mark):")
+ATLASSIAN_CLASS_RE = re.compile(r"atlassian-[\w_-]+")
+HEX_COLOR_RE = re.compile(r"#[A-Fa-f0-9]{6}")
+SYMBOLS_ONLY_RE = re.compile(r"[\W_]+")
+SPACES_RE = re.compile(r"[ \t]+")
+NEWLINES_RE = re.compile(r"\n{2,}")
 
 def clean_content(text):
     # Elimina marcas de Atlassian y colores
-    text = re.sub(r":(info|check_mark|cross_mark):", "", text)
-    text = re.sub(r"atlassian-[\w_-]+", "", text)
-    text = re.sub(r"#[A-Fa-f0-9]{6}", "", text)  # colores hexadecimales
+    text = ATLASSIAN_EMOJI_RE.sub("", text)
+    text = ATLASSIAN_CLASS_RE.sub("", text)
+    text = HEX_COLOR_RE.sub("", text)  # colores hexadecimales
     # Elimina líneas que solo tienen caracteres especiales o están vacías
     lines = text.splitlines()
     cleaned_lines = []
@@ -19,7 +30,7 @@ def clean_content(text):
         line = line.strip()
         if not line:
             continue
-        if re.fullmatch(r"[\W_]+", line):
+        if SYMBOLS_ONLY_RE.fullmatch(line):
             continue
         if line in seen:
             continue  # deduplicación exacta
@@ -27,49 +38,111 @@ def clean_content(text):
         cleaned_lines.append(line)
     # Normaliza espacios múltiples
     cleaned_text = "\n".join(cleaned_lines)
-    cleaned_text = re.sub(r"[ \t]+", " ", cleaned_text)
-    cleaned_text = re.sub(r"\n{2,}", "\n", cleaned_text)
+    cleaned_text = SPACES_RE.sub(" ", cleaned_text)
+    cleaned_text = NEWLINES_RE.sub("\n", cleaned_text)
     return cleaned_text.strip()
 
-def process_jsonl(input_path, output_path):
-    with open(input_path, 'r', encoding='utf-8') as fin, open(output_path, 'w', encoding='utf-8') as fout:
-        for line in tqdm(fin, desc=f"Limpiando {os.path.basename(input_path)}"):
-            record = json.loads(line)
-            content = record.get('content', '')
-            cleaned = clean_content(content)
-            if len(cleaned) > FRAGMENT_LENGTH:
-                # Fragmenta el contenido largo automáticamente
-                fragments = [cleaned[i:i+FRAGMENT_LENGTH] for i in range(0, len(cleaned), FRAGMENT_LENGTH)]
-                for idx, frag in enumerate(fragments):
-                    frag_record = record.copy()  # Copia todos los metadatos
-                    frag_record['content'] = frag
-                    frag_record['fragment'] = idx + 1
-                    frag_record['total_fragments'] = len(fragments)
-                    fout.write(json.dumps(frag_record, ensure_ascii=False) + '\n')
-            else:
-                record['content'] = cleaned
-                fout.write(json.dumps(record, ensure_ascii=False) + '\n')
+def clean_record(line):
+    """Limpia una línea JSONL y devuelve la salida (una línea, o varias si se fragmenta)."""
+    record = json.loads(line)
+    content = record.get('content', '')
+    cleaned = clean_content(content)
+    if len(cleaned) > FRAGMENT_LENGTH:
+        # Fragmenta el contenido largo automáticamente
+        fragments = [cleaned[i:i+FRAGMENT_LENGTH] for i in range(0, len(cleaned), FRAGMENT_LENGTH)]
+        salida = []
+        for idx, frag in enumerate(fragments):
+            frag_record = record.copy()  # Copia todos los metadatos
+            frag_record['content'] = frag
+            frag_record['fragment'] = idx + 1
+            frag_record['total_fragments'] = len(fragments)
+            salida.append(json.dumps(frag_record, ensure_ascii=False) + '\n')
+        return "".join(salida)
+    record['content'] = cleaned
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+def clean_lines(lines):
+    """Tarea del pool: limpia un trozo de líneas. Devuelve (texto de salida, líneas procesadas)."""
+    return "".join(clean_record(line) for line in lines), len(lines)
+
+def iter_chunks(f, chunk_size):
+    chunk = []
+    for line in f:
+        chunk.append(line)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def process_jsonl(input_path, output_path, executor=None, chunk_size=CHUNK_LINES, max_in_flight=8, position=0, progress=True):
+    """
+    Limpia un .jsonl. Con `executor` (pool de procesos) los trozos de `chunk_size` líneas se limpian
+    en paralelo, con hasta `max_in_flight` trozos pendientes, y se escriben en el orden original.
+    Devuelve el número de registros procesados.
+    """
+    pending = deque()
+    total = 0
+    with open(input_path, 'r', encoding='utf-8') as fin, open(output_path, 'w', encoding='utf-8') as fout, \
+            tqdm(desc=f"Limpiando {os.path.basename(input_path)}", unit=" docs", position=position, disable=not progress) as barra:
+
+        def write(result):
+            nonlocal total
+            text, n_lines = result
+            fout.write(text)
+            barra.update(n_lines)
+            total += n_lines
+
+        for chunk in iter_chunks(fin, chunk_size):
+            if executor is None:
+                write(clean_lines(chunk))
+                continue
+            pending.append(executor.submit(clean_lines, chunk))
+            while len(pending) > max_in_flight:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return total
+
+def clean_directory(raw_dir, cleaned_dir, archivos, workers=1, chunk_size=CHUNK_LINES, progress=True):
+    """
+    Limpia todos los archivos a la vez: un hilo por archivo lee y escribe, y la limpieza se reparte
+    en un único pool de `workers` procesos. Con workers=1 todo va en el propio proceso.
+    Devuelve el total de registros procesados.
+    """
+    def procesar(idx, archivo, executor):
+        input_path = os.path.join(raw_dir, archivo)
+        output_path = os.path.join(cleaned_dir, archivo)
+        n = process_jsonl(input_path, output_path, executor, chunk_size, max_in_flight=2 * workers,
+                          position=idx, progress=progress)
+        if progress:
+            tqdm.write(f"Archivo procesado: {archivo} -> {output_path}")
+        return n
+
+    if workers <= 1:
+        return sum(procesar(idx, archivo, None) for idx, archivo in enumerate(archivos))
+    with ProcessPoolExecutor(max_workers=workers) as executor, ThreadPoolExecutor(max_workers=len(archivos)) as lectores:
+        futures = [lectores.submit(procesar, idx, archivo, executor) for idx, archivo in enumerate(archivos)]
+        return sum(future.result() for future in futures)
 
 def main():
     parser = argparse.ArgumentParser(description="Limpia y optimiza todos los archivos .jsonl en la carpeta de entrada y los guarda en la de salida. Fragmenta automáticamente si el contenido supera 2,000 caracteres.")
     parser.add_argument('--input-dir', type=str, default='data/raw_data', help='Carpeta de entrada')
     parser.add_argument('--output-dir', type=str, default='data/cleaned_data', help='Carpeta de salida')
+    parser.add_argument('--workers', type=int, default=int(os.getenv("CLEANING_WORKERS") or os.cpu_count() or 1), help='Procesos de limpieza (1 = sin pool, todo en este proceso)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_LINES, help='Líneas por tarea del pool de procesos')
     args = parser.parse_args()
 
     raw_dir = args.input_dir
     cleaned_dir = args.output_dir
     os.makedirs(cleaned_dir, exist_ok=True)
 
-    archivos = [f for f in os.listdir(raw_dir) if f.endswith('.jsonl')]
+    archivos = sorted(f for f in os.listdir(raw_dir) if f.endswith('.jsonl'))
     if not archivos:
         print(f'No se encontraron archivos .jsonl en {raw_dir}')
         return
 
-    for archivo in archivos:
-        input_path = os.path.join(raw_dir, archivo)
-        output_path = os.path.join(cleaned_dir, archivo)
-        process_jsonl(input_path, output_path)
-        print(f"Archivo procesado: {archivo} -> {output_path}")
+    clean_directory(raw_dir, cleaned_dir, archivos, args.workers, args.chunk_size)
 
 if __name__ == "__main__":
     main()
@@ -33,12 +33,19 @@ def main():
     parser.add_argument('--skip-fragment', action='store_true', help='Saltar fragmentación')
     parser.add_argument('--skip-load', action='store_true', help='Saltar carga a ChromaDB')
     parser.add_argument('--skip-export', action='store_true', help='Saltar exportación final')
-    parser.add_argument('--output-format', type=str, default='jsonl', choices=['jsonl','txt','md'], help='Formato de exportación final')
+    parser.add_argument('--embedding-backend', type=str, default=None, choices=['sentence-transformers','onnx','onnx-int8'], help='Backend de embeddings para la carga (default: EMBEDDING_BACKEND o sentence-transformers)')
+    parser.add_argument('--embedding-workers', type=int, default=None, help='Procesos de embeddings en la carga (default: EMBEDDING_WORKERS o 1)')
+    parser.add_argument('--hnsw-m', type=int, default=None, help='hnsw:M de la colección nueva (opcional, ver benchmarks/hnsw_tuning.py)')
+    parser.add_argument('--hnsw-construction-ef', type=int, default=None, help='hnsw:construction_ef de la colección nueva (opcional)')
+    parser.add_argument('--hnsw-search-ef', type=int, default=None, help='hnsw:search_ef por defecto de la colección nueva (opcional)')
+    parser.add_argument('--sync', action='store_true', help='Sincronizar la colección --collection existente (sin sufijo de ejecución) en lugar de crear una nueva')
+    parser.add_argument('--output-format', type=str, default='jsonl', choices=['jsonl','txt','md','parquet'], help='Formato de exportación final (parquet incluye los embeddings)')
     args = parser.parse_args()
 
     # 1. Generar identificador único (timestamp)
     run_id = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    collection_name = f"{args.collection}_{run_id}"
+    # Con --sync se actualiza siempre la misma colección: solo se reescriben los documentos cambiados
+    collection_name = args.collection if args.sync else f"{args.collection}_{run_id}"
 
     # 2. Crear subcarpetas
     raw_dir = f"data/raw_data/{run_id}"
@@ -101,11 +108,20 @@ def main():
     if not args.skip_load:
         # Usar fragmented_data si hay archivos, si no cleaned_data
         docs_dir = frag_dir if os.listdir(frag_dir) else clean_dir
-        run_step([
+        load_cmd = [
             "python", "chroma_db_scripts/add_data_to_chromadb.py",
             "--documents-dir", docs_dir,
             "--collection", collection_name
-        ], f"Carga de documentos a ChromaDB en colección {collection_name} desde {docs_dir}", log_lines)
+        ]
+        if args.embedding_backend:
+            load_cmd += ["--embedding-backend", args.embedding_backend]
+        if args.sync:
+            load_cmd.append("--sync")
+        for flag, value in (("--embedding-workers", args.embedding_workers), ("--hnsw-m", args.hnsw_m),
+                            ("--hnsw-construction-ef", args.hnsw_construction_ef), ("--hnsw-search-ef", args.hnsw_search_ef)):
+            if value is not None:
+                load_cmd += [flag, str(value)]
+        run_step(load_cmd, f"Carga de documentos a ChromaDB en colección {collection_name} desde {docs_dir}", log_lines)
 
     # 7. Exportación final
     if not args.skip_export: